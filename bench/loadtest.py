@@ -0,0 +1,397 @@
+"""Replays synthetic Telegram traffic through the real dispatcher.
+
+    python -m bench.loadtest --users 5000 --teams 500
+    python -m bench.loadtest --backend sqlite --concurrency 128 --json result.json
+    python -m bench.loadtest --mode webhook
+
+Every simulated person runs a full flow (questionnaire, browsing, requests
+or invites and the answers to them) as a sequence of updates fed to
+Dispatcher.feed_update with the routers from handlers/. The Bot uses a fake
+session that answers every API call locally, optionally after --api-latency
+ms. Storage goes to a throwaway DATA_DIR, so the real data is never touched.
+With --mode webhook the dispatcher also gets the middlewares build_app adds
+(per-user ordering, concurrency limit), as in webhook mode and on workers.
+
+Reports throughput, per-handler latency percentiles, Bot API calls by method
+and storage I/O counts from the metrics registry. Exits with status 1 if any
+update failed or the "button spam" phase (--spam-presses concurrent presses
+of one "next" button per solo) wasn't coalesced by ThrottlingMiddleware.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000, help="solo participants")
+    parser.add_argument("--teams", type=int, default=500, help="team owners")
+    parser.add_argument("--concurrency", type=int, default=64, help="people acting at the same time")
+    parser.add_argument("--browse-pages", type=int, default=5, help="cards each person pages through")
+    parser.add_argument("--spam-presses", type=int, default=5, help="simultaneous presses of one button (below 3: skip)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Bot API latency, ms")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default=os.getenv("STORAGE_BACKEND", "json"))
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling", help="middleware setup to mirror")
+    parser.add_argument("--data-dir", help="storage directory (default: a fresh temp dir)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    return parser.parse_args()
+
+
+# Configure storage before anything imports config.
+ARGS = _parse_args() if __name__ == "__main__" else None
+if ARGS is not None:
+    os.environ["DATA_DIR"] = ARGS.data_dir or tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["STORAGE_BACKEND"] = ARGS.backend
+    os.environ["FSM_STORAGE"] = "memory"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio  # noqa: E402
+import itertools  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime  # noqa: E402
+from typing import Any, AsyncGenerator, Awaitable, Callable  # noqa: E402
+
+from aiogram import BaseMiddleware, Bot, Dispatcher  # noqa: E402
+from aiogram.client.default import DefaultBotProperties  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.enums import ParseMode  # noqa: E402
+from aiogram.methods import EditMessageReplyMarkup, EditMessageText, SendMessage, TelegramMethod  # noqa: E402
+from aiogram.types import CallbackQuery, Chat, InlineKeyboardMarkup, Message, TelegramObject, Update, User  # noqa: E402
+
+BOT_ID = 123456
+NEXT_BUTTON = "Вперёд →"
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+class FakeSession(BaseSession):
+    """Answers Bot API calls locally, counts them by method and keeps each chat's last edited keyboard."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__()
+        self.latency = latency
+        self.calls: dict[str, int] = {}
+        self.markups: dict[int, InlineKeyboardMarkup | None] = {}
+
+    def button(self, chat_id: int, text: str) -> str | None:
+        """callback_data of the button labelled `text` in the chat's last edited message."""
+        markup = self.markups.get(chat_id)
+        for row in markup.inline_keyboard if markup else ():
+            for button in row:
+                if button.text == text:
+                    return button.callback_data
+        return None
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None) -> Any:
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)) and isinstance(method.chat_id, int):
+            self.markups[method.chat_id] = method.reply_markup
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=next(_message_ids),
+                date=datetime.now(),
+                chat=Chat(id=method.chat_id, type="private"),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, url: str, headers: dict | None = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class HandlerTimer(BaseMiddleware):
+    """Inner middleware keeping every handler duration for exact percentiles."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        callback = data["handler"].callback
+        name = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+
+def _user(user_id: int) -> User:
+    return User(id=user_id, is_bot=False, first_name=f"User{user_id}", username=f"user{user_id}")
+
+
+def message_update(user_id: int, text: str) -> Update:
+    return Update(
+        update_id=next(_update_ids),
+        message=Message(
+            message_id=next(_message_ids),
+            date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=_user(user_id),
+            text=text,
+        ),
+    )
+
+
+def callback_update(user_id: int, data: str) -> Update:
+    bot_message = Message(
+        message_id=next(_message_ids),
+        date=datetime.now(),
+        chat=Chat(id=user_id, type="private"),
+        from_user=User(id=BOT_ID, is_bot=True, first_name="Bot"),
+        text="...",
+    )
+    return Update(
+        update_id=next(_update_ids),
+        callback_query=CallbackQuery(
+            id=str(next(_update_ids)),
+            from_user=_user(user_id),
+            chat_instance=str(user_id),
+            message=bot_message,
+            data=data,
+        ),
+    )
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace) -> None:
+        from handlers import admin_router, common_router, solo_router, start_router, team_router
+        from keyboards.inline import SPECIALTIES
+        from middlewares import EditMemoMiddleware, ThrottlingMiddleware
+        from notify import Outbox
+        from webhook import build_app
+
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.specialties = list(SPECIALTIES)
+        self.session = FakeSession(args.api_latency / 1000)
+        self.bot = Bot(token=f"{BOT_ID}:LOADTEST", session=self.session,
+                       default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+        self.dp = Dispatcher()
+        for router in (start_router, solo_router, team_router, admin_router, common_router):
+            self.dp.include_router(router)
+        # Same request-side middlewares as main.py.
+        self.dp.update.outer_middleware(ThrottlingMiddleware())
+        self.bot.session.middleware(EditMemoMiddleware())
+        if args.mode == "webhook":
+            build_app(self.bot, self.dp)
+        self.timer = HandlerTimer()
+        for name, observer in self.dp.observers.items():
+            if name not in ("update", "error"):
+                observer.middleware(self.timer)
+        # No real rate limits to respect here.
+        self.outbox = Outbox(self.bot, workers=8, global_rate=1e9, chat_rate=1e9, chat_burst=1e9)
+        self.dp["outbox"] = self.outbox
+        self.dp["request_digest"] = None
+        self.dp["broadcaster"] = None
+        self.owner_ids = [1_000_000 + i for i in range(args.teams)]
+        self.solo_ids = [2_000_000 + i for i in range(args.users)]
+        self.updates = 0
+        self.errors: dict[str, int] = {}
+
+    async def feed(self, update: Update) -> None:
+        self.updates += 1
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            key = type(e).__name__
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    async def message(self, user_id: int, text: str) -> None:
+        await self.feed(message_update(user_id, text))
+
+    async def click(self, user_id: int, data: str) -> None:
+        await self.feed(callback_update(user_id, data))
+
+    async def page_through(self, user_id: int) -> None:
+        """Presses "next" on the card just shown, as a person would, up to --browse-pages cards."""
+        for _ in range(1, self.args.browse_pages):
+            data = self.session.button(user_id, NEXT_BUTTON)
+            if data is None:
+                break
+            await self.click(user_id, data)
+
+    # --- flows ---
+    async def register_team(self, owner_id: int) -> None:
+        await self.message(owner_id, "/start")
+        await self.click(owner_id, "mode:team")
+        await self.message(owner_id, f"Team {owner_id}")
+        await self.click(owner_id, f"pitch:{self.rng.choice(['online', 'offline'])}")
+        await self.message(owner_id, "Делаем уютный платформер, ищем людей в команду.")
+        for role in self.rng.sample(["designer", "programmer", "music", "other"], 2):
+            await self.click(owner_id, f"role:{role}")
+        await self.click(owner_id, "roles:done")
+
+    async def register_solo(self, solo_id: int) -> None:
+        await self.message(solo_id, "/start")
+        await self.click(solo_id, "mode:solo")
+        await self.message(solo_id, f"Solo {solo_id}")
+        await self.click(solo_id, f"age:{self.rng.choice(['18-', '18+'])}")
+        await self.click(solo_id, f"format:{self.rng.choice(['online', 'offline'])}")
+        await self.click(solo_id, f"specialty:{self.rng.choice(self.specialties)}")
+        await self.message(solo_id, "Делал пару джемов, умею в Unity и пиксель-арт.")
+
+    async def solo_activity(self, solo_id: int) -> None:
+        await self.click(solo_id, "solo:browse:0")
+        await self.page_through(solo_id)
+        await self.click(solo_id, f"request:{self.rng.choice(self.owner_ids)}")
+
+    async def button_spam(self, solo_id: int) -> None:
+        """Presses "next" several times at once; only the first and the last press should be handled."""
+        await self.click(solo_id, "solo:browse:0")
+        data = self.session.button(solo_id, NEXT_BUTTON)
+        if data is not None:
+            await asyncio.gather(*(self.click(solo_id, data) for _ in range(self.args.spam_presses)))
+
+    async def team_activity(self, owner_id: int) -> None:
+        from storage.aio import get_pending_requests
+
+        await self.click(owner_id, "team:requests")
+        for req in await get_pending_requests(owner_id):
+            await self.click(owner_id, f"{self.rng.choice(['accept', 'deny'])}:{req['request_id']}")
+        await self.click(owner_id, "team:search_solos")
+        spec = self.rng.choice(self.specialties + ["all"])
+        await self.click(owner_id, f"solofilter:{spec}")
+        await self.page_through(owner_id)
+        for solo_id in self.rng.sample(self.solo_ids, min(3, len(self.solo_ids))):
+            await self.click(owner_id, f"invite:{solo_id}")
+
+    async def answer_invites(self, solo_id: int) -> None:
+        from storage.aio import get_pending_invites_for_solo
+
+        for inv in await get_pending_invites_for_solo(solo_id):
+            await self.click(solo_id, f"{self.rng.choice(['invite_accept', 'invite_deny'])}:{inv['invite_id']}")
+
+    async def phase(self, name: str, flow: Callable[[int], Awaitable[None]], ids: list[int]) -> dict:
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def run(person: int) -> None:
+            async with semaphore:
+                await flow(person)
+
+        before = self.updates
+        start = time.perf_counter()
+        await asyncio.gather(*(run(person) for person in ids))
+        elapsed = time.perf_counter() - start
+        updates = self.updates - before
+        print(f"{name:<16} {updates:>7} updates in {elapsed:7.2f} s  ({updates / elapsed:8.1f} upd/s)", flush=True)
+        return {"phase": name, "updates": updates, "seconds": elapsed}
+
+    async def run(self) -> dict:
+        import metrics
+        from storage import flush_writes, start_writer
+
+        start_writer()
+        self.outbox.start()
+        start = time.perf_counter()
+        phases = [
+            await self.phase("register teams", self.register_team, self.owner_ids),
+            await self.phase("register solos", self.register_solo, self.solo_ids),
+            await self.phase("solo activity", self.solo_activity, self.solo_ids),
+        ]
+        if self.args.spam_presses > 2:
+            phases.append(await self.phase("button spam", self.button_spam, self.solo_ids))
+            if not metrics.callbacks_throttled_total.value(rule="solo_browse", reason="coalesced"):
+                self.errors["BrowseNotCoalesced"] = 1
+        phases += [
+            await self.phase("team activity", self.team_activity, self.owner_ids),
+            await self.phase("answer invites", self.answer_invites, self.solo_ids),
+        ]
+        await self.outbox.close()
+        await flush_writes()
+        elapsed = time.perf_counter() - start
+        return self.report(phases, elapsed)
+
+    def report(self, phases: list[dict], elapsed: float) -> dict:
+        import metrics
+
+        handlers = {}
+        for name, samples in self.timer.samples.items():
+            samples.sort()
+            handlers[name] = {
+                "count": len(samples),
+                "p50_ms": samples[len(samples) // 2] * 1000,
+                "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+                "max_ms": samples[-1] * 1000,
+                "total_s": sum(samples),
+            }
+        reads, read_seconds = metrics.storage_read_seconds.total()
+        writes, write_seconds = metrics.storage_write_seconds.total()
+        _, read_bytes = metrics.storage_read_bytes.total()
+        _, write_bytes = metrics.storage_write_bytes.total()
+        return {
+            "backend": self.args.backend,
+            "mode": self.args.mode,
+            "users": self.args.users,
+            "teams": self.args.teams,
+            "concurrency": self.args.concurrency,
+            "updates": self.updates,
+            "seconds": elapsed,
+            "updates_per_second": self.updates / elapsed if elapsed else 0.0,
+            "errors": self.errors,
+            "phases": phases,
+            "handlers": handlers,
+            "api_calls": dict(sorted(self.session.calls.items())),
+            "callbacks_throttled": metrics.callbacks_throttled_total.total(),
+            "storage": {
+                "disk_reads": reads,
+                "disk_read_seconds": read_seconds,
+                "disk_read_bytes": read_bytes,
+                "cache_hits": metrics.storage_cache_hits_total.total(),
+                "disk_writes": writes,
+                "disk_write_seconds": write_seconds,
+                "disk_write_bytes": write_bytes,
+                "journal_appends": metrics.storage_journal_appends_total.total(),
+            },
+        }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"\n{report['updates']} updates in {report['seconds']:.2f} s: {report['updates_per_second']:.1f} upd/s "
+        f"({report['backend']}, {report['mode']}, {report['users']} users, {report['teams']} teams, concurrency {report['concurrency']})"
+    )
+    if report["errors"]:
+        print("errors:", ", ".join(f"{k} x{v}" for k, v in report["errors"].items()))
+    print(f"\n{'handler':<32} {'count':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'total s':>8}")
+    for name, h in sorted(report["handlers"].items(), key=lambda item: -item[1]["total_s"]):
+        print(f"{name:<32} {h['count']:>7} {h['p50_ms']:>8.2f} {h['p99_ms']:>8.2f} {h['max_ms']:>8.2f} {h['total_s']:>8.2f}")
+    print("\nBot API calls:", ", ".join(f"{k} {v}" for k, v in report["api_calls"].items()))
+    print(f"Button presses throttled or coalesced: {report['callbacks_throttled']:.0f}")
+    s = report["storage"]
+    print(
+        f"Storage: {s['disk_reads']} disk reads ({s['disk_read_bytes'] / 2**20:.1f} MiB, {s['disk_read_seconds']:.2f} s), "
+        f"{s['cache_hits']:.0f} cache hits, {s['disk_writes']} disk writes "
+        f"({s['disk_write_bytes'] / 2**20:.1f} MiB, {s['disk_write_seconds']:.2f} s), "
+        f"{s['journal_appends']:.0f} journal appends"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"Data dir: {os.environ['DATA_DIR']}")
+    report = await LoadTest(args).run()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if report["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(ARGS))
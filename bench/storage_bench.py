@@ -0,0 +1,287 @@
+"""Microbenchmarks for the storage functions at 1k, 10k and 100k records.
+
+    python -m bench.storage_bench
+    python -m bench.storage_bench --sizes 1000 10000 --backend sqlite --json baseline.json
+    python -m bench.storage_bench --sync-writes --only get_user save_user
+
+Each size runs in its own process against a fresh DATA_DIR seeded with that
+many users, teams, requests and invites (SQLite is seeded through
+storage.migrate). Every exported storage function is called repeatedly
+with random arguments until --min-time has passed. Per function the report
+gives mean/min/p50/p99 latency and a tracemalloc peak over a few extra
+calls. Per size it also gives the peak memory of the cold load and the
+process max RSS. Writes go through the debounced background writer like in
+the bot, unless --sync-writes is given, which makes every mutation write its
+file the way scripts do.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+SPECIALTIES = ["gamedesign", "designer", "programmer", "artist", "sound", "producer", "other"]
+ROLES = ["designer", "programmer", "music", "other"]
+
+
+def seed(data_dir: Path, n: int, rng: random.Random) -> None:
+    """Writes users/teams/requests/invites JSON files with n records each."""
+    now = datetime.utcnow()
+    users, teams, requests, invites = {}, {}, {}, {}
+    for i in range(n):
+        uid = 2_000_000 + i
+        users[str(uid)] = {
+            "user_id": uid,
+            "username": f"user{uid}",
+            "display_name": f"User {uid}",
+            "age_category": rng.choice(["18-", "18+"]),
+            "participation_format": rng.choice(["online", "offline"]),
+            "specialty": rng.choice(SPECIALTIES),
+            "description": "Делал пару джемов, умею в Unity и пиксель-арт.",
+            "is_active": rng.random() < 0.9,
+            "created_at": (now - timedelta(minutes=n - i)).isoformat(),
+        }
+        oid = 1_000_000 + i
+        teams[f"owner_{oid}"] = {
+            "owner_id": oid,
+            "owner_username": f"owner{oid}",
+            "team_number": i + 1,
+            "team_name": f"Team {i + 1}",
+            "description": "Делаем уютный платформер, ищем людей в команду.",
+            "roles_needed": rng.sample(ROLES, 2),
+            "pitch_format": rng.choice(["online", "offline"]),
+            "is_paused": rng.random() < 0.1,
+            "members": [],
+            "created_at": (now - timedelta(minutes=n - i)).isoformat(),
+        }
+    for i in range(n):
+        solo, owner = 2_000_000 + rng.randrange(n), 1_000_000 + rng.randrange(n)
+        created = (now - timedelta(seconds=n - i)).isoformat()
+        status = rng.choice(["pending", "pending", "accepted", "denied"])
+        rid = f"{solo}_{owner}_{i}"
+        requests[rid] = {"request_id": rid, "solo_id": solo, "team_owner_id": owner, "status": status, "created_at": created}
+        iid = f"inv_{owner}_{solo}_{i}"
+        invites[iid] = {"invite_id": iid, "team_owner_id": owner, "solo_id": solo, "status": status, "created_at": created}
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for name, records in (("users", users), ("teams", teams), ("requests", requests), ("invites", invites)):
+        (data_dir / f"{name}.json").write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def measure(fn: Callable[[], Any], min_time: float, max_calls: int) -> dict:
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < 3 or (time.perf_counter() < deadline and len(samples) < max_calls):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "calls": len(samples),
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "min_us": samples[0] * 1e6,
+        "p50_us": _percentile(samples, 0.5) * 1e6,
+        "p99_us": _percentile(samples, 0.99) * 1e6,
+        "ops_per_s": len(samples) / sum(samples) if sum(samples) else float("inf"),
+    }
+
+
+def peak_memory(fn: Callable[[], Any], calls: int = 3) -> int:
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def cases(storage: Any, n: int, rng: random.Random) -> dict[str, Callable[[], Any]]:
+    """One zero-argument callable per storage function, drawing fresh arguments each call."""
+    solo = lambda: 2_000_000 + rng.randrange(n)  # noqa: E731
+    owner = lambda: 1_000_000 + rng.randrange(n)  # noqa: E731
+    request_ids = list(storage.get_requests())
+    invite_ids = list(storage.get_invites()) if hasattr(storage, "get_invites") else []
+    new_owners = iter(range(3_000_000, 4_000_000))
+    doomed = iter(range(3_000_000, 4_000_000))
+
+    def save_user() -> None:
+        uid = solo()
+        storage.save_user(uid, f"user{uid}", f"User {uid}", "18+", "online", rng.choice(SPECIALTIES), "Обновлённое описание")
+
+    def save_team() -> None:
+        # Mostly edits, sometimes a brand-new team (which needs a team number).
+        oid = next(new_owners) if rng.random() < 0.2 else owner()
+        storage.save_team(oid, f"owner{oid}", "Team", "Делаем уютный платформер.", rng.sample(ROLES, 2))
+
+    def delete_team() -> None:
+        # Only deletes teams the save_team case created, so sizes stay put.
+        oid = next(doomed)
+        if storage.get_team(oid) is None:
+            storage.save_team(oid, "x", "x", "x", ["other"])
+        storage.delete_team(oid)
+
+    result = {
+        "get_users": storage.get_users,
+        "get_user": lambda: storage.get_user(solo()),
+        "save_user": save_user,
+        "set_user_active": lambda: storage.set_user_active(solo(), rng.random() < 0.9),
+        "get_active_users": storage.get_active_users,
+        "get_active_users_by_specialty": lambda: storage.get_active_users_by_specialty(rng.choice(SPECIALTIES)),
+        "find_active_users": lambda: storage.find_active_users(
+            rng.sample(SPECIALTIES, 2), rng.choice(["online", "offline"]), rng.choice(["18-", "18+"])
+        ),
+        "get_teams": storage.get_teams,
+        "get_team": lambda: storage.get_team(owner()),
+        "get_active_teams": storage.get_active_teams,
+        "save_team": save_team,
+        "delete_team": delete_team,
+        "toggle_team_pause": lambda: storage.toggle_team_pause(owner()),
+        "create_request": lambda: storage.create_request(solo(), owner()),
+        "get_request": lambda: storage.get_request(rng.choice(request_ids)),
+        "get_requests": storage.get_requests,
+        "get_pending_requests": lambda: storage.get_pending_requests(owner()),
+        "get_request_by_solo_and_team": lambda: storage.get_request_by_solo_and_team(solo(), owner()),
+        "update_request_status": lambda: storage.update_request_status(
+            rng.choice(request_ids), rng.choice(["pending", "accepted", "denied"])
+        ),
+        "create_invite": lambda: storage.create_invite(owner(), solo()),
+        "get_invite": lambda: storage.get_invite(rng.choice(invite_ids)),
+        "get_pending_invites_for_solo": lambda: storage.get_pending_invites_for_solo(solo()),
+        "update_invite_status": lambda: storage.update_invite_status(
+            rng.choice(invite_ids), rng.choice(["pending", "accepted", "denied"])
+        ),
+        "get_stats": storage.get_stats,
+    }
+    return result
+
+
+def prepare(args: argparse.Namespace, n: int) -> Path:
+    """Seeds a fresh DATA_DIR and points config at it; must run before config is imported."""
+    data_dir = Path(tempfile.mkdtemp(prefix=f"storage-bench-{n}-"))
+    os.environ["DATA_DIR"] = str(data_dir)
+    os.environ["STORAGE_BACKEND"] = args.backend
+    sys.path.insert(0, str(ROOT))
+    seed(data_dir, n, random.Random(args.seed))
+    if args.backend == "sqlite":
+        from storage.migrate import migrate
+
+        migrate()
+    return data_dir
+
+
+def run_size(args: argparse.Namespace, n: int, data_dir: Path) -> dict:
+    rng = random.Random(args.seed + 1)
+    import storage
+    from storage import json_storage, sqlite_storage
+
+    module = sqlite_storage if args.backend == "sqlite" else json_storage
+
+    tracemalloc.start()
+    load_start = time.perf_counter()
+    storage.get_users(), storage.get_teams(), storage.get_requests(), module.get_invites()
+    storage.find_active_users(), storage.get_active_teams(), storage.get_stats()
+    load_seconds = time.perf_counter() - load_start
+    load_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    results = {}
+    for name, fn in cases(module, n, rng).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(fn, args.min_time, args.max_calls)
+        results[name]["peak_bytes"] = peak_memory(fn)
+        print(f"  {n:>7} {name:<32} {results[name]['mean_us']:>12.1f} us", file=sys.stderr, flush=True)
+    return {
+        "records": n,
+        "data_dir": str(data_dir),
+        "cold_load_seconds": load_seconds,
+        "cold_load_peak_bytes": load_peak,
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "functions": results,
+    }
+
+
+async def child_main(args: argparse.Namespace) -> dict:
+    data_dir = prepare(args, args.child)
+    if args.sync_writes:
+        return run_size(args, args.child, data_dir)
+    # Same write path as the bot: debounced writer on this loop, storage calls on another thread.
+    from storage import flush_writes, start_writer
+
+    start_writer()
+    report = await asyncio.to_thread(run_size, args, args.child, data_dir)
+    await flush_writes()
+    return report
+
+
+def print_report(report: dict) -> None:
+    sizes = report["sizes"]
+    names = sorted({name for size in sizes for name in size["functions"]})
+    header = f"{'function':<32}" + "".join(f"{size['records']:>14,}" for size in sizes)
+    print(f"\nmean latency, us ({report['backend']}, {'sync' if report['sync_writes'] else 'debounced'} writes)")
+    print(header)
+    for name in names:
+        cells = "".join(
+            f"{size['functions'][name]['mean_us']:>14.1f}" if name in size["functions"] else f"{'—':>14}"
+            for size in sizes
+        )
+        print(f"{name:<32}{cells}")
+    print()
+    for size in sizes:
+        print(
+            f"{size['records']:>7,} records: cold load {size['cold_load_seconds']:.2f} s, "
+            f"peak {size['cold_load_peak_bytes'] / 2**20:.1f} MiB, max RSS {size['max_rss_bytes'] / 2**20:.1f} MiB"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--sync-writes", action="store_true", help="write files on every mutation (script mode)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent per function")
+    parser.add_argument("--max-calls", type=int, default=2000)
+    parser.add_argument("--only", nargs="+", help="benchmark only these functions")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="write the report as JSON")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(asyncio.run(child_main(args))))
+        return
+
+    sizes = []
+    for n in args.sizes:
+        child = [sys.executable, "-m", "bench.storage_bench", "--child", str(n)] + sys.argv[1:]
+        out = subprocess.run(child, cwd=ROOT, check=True, stdout=subprocess.PIPE, text=True).stdout
+        sizes.append(json.loads(out.strip().splitlines()[-1]))
+    report = {
+        "backend": args.backend,
+        "sync_writes": args.sync_writes,
+        "python": sys.version.split()[0],
+        "timestamp": datetime.utcnow().isoformat(),
+        "sizes": sizes,
+    }
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
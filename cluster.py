@@ -0,0 +1,213 @@
+"""Multi-process mode: one front process, BOT_WORKERS bot processes.
+
+The front process owns the connection to Telegram (long polling or the public
+webhook) and does nothing but forward raw updates. Each update goes to worker
+`user_id % BOT_WORKERS`, over one ordered queue per worker, so all of a user's
+updates (and their FSM state) stay in one process; there PerUserOrderMiddleware
+handles them one at a time, in arrival order. Workers
+are ordinary bots that receive updates on 127.0.0.1:WORKER_BASE_PORT+i and
+share data through the SQLite storage backend.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import sys
+from pathlib import Path
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiohttp import web
+
+from config import BOT_MODE, BOT_WORKERS, WEB_HOST, WEB_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WORKER_BASE_PORT
+from webhook import build_app, serving, set_webhook
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+WORKER_PATH = "/update"
+
+
+def user_of(update: dict) -> int | None:
+    """Id of the user an update comes from (the chat for anonymous updates)."""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        sender = event.get("from") or event.get("user") or event.get("chat")
+        if sender is None and isinstance(event.get("message"), dict):
+            sender = event["message"].get("chat")
+        return sender.get("id") if isinstance(sender, dict) else None
+    return None
+
+
+def shard_of(user_id: int | None, workers: int) -> int:
+    return user_id % workers if user_id is not None else 0
+
+
+class Forwarder:
+    """One ordered queue per worker; each is drained by a task posting updates one by one.
+
+    A worker that is down or restarting is retried with backoff, keeping the
+    queue's order; updates the worker rejects (4xx) are logged and dropped.
+    put() waits while the worker's queue is full, which pushes back on
+    Telegram instead of buffering without bound.
+    """
+
+    def __init__(self, workers: int, secret: str, max_pending: int = 1000) -> None:
+        self.secret = secret
+        self._queues = [asyncio.Queue(max_pending) for _ in range(workers)]
+        self._session: aiohttp.ClientSession | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._session = aiohttp.ClientSession()
+        self._tasks = [asyncio.create_task(self._pump(i, queue)) for i, queue in enumerate(self._queues)]
+
+    async def put(self, update: dict) -> None:
+        await self._queues[shard_of(user_of(update), len(self._queues))].put(update)
+
+    async def close(self, timeout: float = 10) -> None:
+        """Gives the workers `timeout` seconds to take what is queued, then stops."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d undelivered updates", sum(q.qsize() for q in self._queues))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+    async def _pump(self, index: int, queue: asyncio.Queue) -> None:
+        url = f"http://127.0.0.1:{WORKER_BASE_PORT + index}{WORKER_PATH}"
+        while True:
+            update = await queue.get()
+            delay = 0.5
+            while not await self._post(url, update):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10)
+            queue.task_done()
+
+    async def _post(self, url: str, update: dict) -> bool:
+        """True once the update is settled (accepted or rejected), False to retry."""
+        try:
+            async with self._session.post(url, json=update, headers={SECRET_HEADER: self.secret}) as resp:
+                if resp.status < 400:
+                    return True
+                if resp.status < 500:
+                    logger.error("Worker at %s rejected update %s: %s", url, update.get("update_id"), resp.status)
+                    return True
+        except aiohttp.ClientError:
+            pass
+        return False
+
+
+class Supervisor:
+    """Runs the worker processes and restarts any that exit."""
+
+    def __init__(self, workers: int, secret: str) -> None:
+        self.workers = workers
+        self.secret = secret
+        self._procs: dict[int, asyncio.subprocess.Process] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._keep_running(i)) for i in range(self.workers)]
+
+    async def close(self, timeout: float = 30) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        procs = [p for p in self._procs.values() if p.returncode is None]
+        for proc in procs:
+            proc.terminate()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in procs)), timeout)
+        except asyncio.TimeoutError:
+            for proc in procs:
+                if proc.returncode is None:
+                    proc.kill()
+
+    async def _keep_running(self, index: int) -> None:
+        env = dict(os.environ, BOT_WORKER_INDEX=str(index), BOT_WORKER_SECRET=self.secret)
+        main = Path(__file__).with_name("main.py")
+        while True:
+            # Own session: Ctrl+C reaches only the front, which stops workers after draining.
+            proc = self._procs[index] = await asyncio.create_subprocess_exec(
+                sys.executable, str(main), env=env, start_new_session=True
+            )
+            code = await proc.wait()
+            logger.error("Worker %d exited with code %s, restarting", index, code)
+            await asyncio.sleep(1)
+
+
+async def _poll(bot: Bot, forwarder: Forwarder, allowed_updates: list[str]) -> None:
+    # A webhook left over from a previous deploy blocks getUpdates.
+    await bot.delete_webhook()
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            continue
+        except (TelegramNetworkError, TelegramServerError) as e:
+            logger.warning("getUpdates failed: %r", e)
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            await forwarder.put(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+            offset = update.update_id + 1
+
+
+async def _serve_webhook(bot: Bot, forwarder: Forwarder, allowed_updates: list[str]) -> None:
+    async def receive(request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get(SECRET_HEADER) != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        await forwarder.put(await request.json())
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, receive)
+    async with serving(app, WEB_HOST, WEB_PORT):
+        logger.info("Front listening for webhook calls on %s:%s%s", WEB_HOST, WEB_PORT, WEBHOOK_PATH)
+        await set_webhook(bot, allowed_updates)
+        await asyncio.Event().wait()
+
+
+async def run_front(bot: Bot, allowed_updates: list[str]) -> None:
+    """Starts BOT_WORKERS workers and feeds them updates until cancelled (SIGINT/SIGTERM)."""
+    task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    except NotImplementedError:  # Windows
+        pass
+    secret = secrets.token_urlsafe(32)
+    supervisor = Supervisor(BOT_WORKERS, secret)
+    forwarder = Forwarder(BOT_WORKERS, secret)
+    supervisor.start()
+    forwarder.start()
+    logger.info("Front process started %d workers in %s mode", BOT_WORKERS, BOT_MODE)
+    try:
+        if BOT_MODE == "webhook":
+            await _serve_webhook(bot, forwarder, allowed_updates)
+        else:
+            await _poll(bot, forwarder, allowed_updates)
+    finally:
+        await forwarder.close()
+        await supervisor.close()
+
+
+async def run_worker(bot: Bot, dp: Dispatcher, index: int) -> None:
+    """Serves updates forwarded by the front process until cancelled (SIGINT/SIGTERM)."""
+    task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    except NotImplementedError:
+        pass
+    port = WORKER_BASE_PORT + index
+    async with serving(build_app(bot, dp, path=WORKER_PATH, secret=os.environ["BOT_WORKER_SECRET"]), "127.0.0.1", port):
+        logger.info("Worker %d listening on 127.0.0.1:%d", index, port)
+        await asyncio.Event().wait()
@@ -10,8 +10,72 @@ ADMIN_IDS: list[int] = []
 _admin_raw = os.getenv("ADMIN_IDS", "")
 if _admin_raw:
     ADMIN_IDS = [int(x.strip()) for x in _admin_raw.split(",") if x.strip()]
-DATA_DIR = Path(__file__).resolve().parent / "data"
+DATA_DIR = Path(os.getenv("DATA_DIR") or Path(__file__).resolve().parent / "data")
 USERS_FILE = DATA_DIR / "users.json"
 TEAMS_FILE = DATA_DIR / "teams.json"
 REQUESTS_FILE = DATA_DIR / "requests.json"
 INVITES_FILE = DATA_DIR / "invites.json"
+# JSON backend: counters behind team numbers and request/invite ids
+SEQUENCES_FILE = DATA_DIR / "sequences.json"
+
+# "json" (files in DATA_DIR) or "sqlite" (single database file, see storage.migrate)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").strip().lower()
+SQLITE_FILE = Path(os.getenv("SQLITE_FILE") or DATA_DIR / "bot.sqlite3")
+# JSON backend: mutations of the same file within this many seconds are
+# coalesced into one background write (0 writes synchronously)
+STORAGE_WRITE_DELAY = float(os.getenv("STORAGE_WRITE_DELAY", "0.2"))
+# JSON backend: requests/invites are appended to a .log.jsonl journal, which is
+# folded back into the snapshot file once it grows past this many bytes
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(1024 * 1024)))
+# Threads serving storage.aio calls and background writes
+STORAGE_WORKERS = int(os.getenv("STORAGE_WORKERS", "4"))
+
+# FSM (questionnaire) storage: "memory", "sqlite" or "redis"
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite").strip().lower()
+FSM_SQLITE_FILE = Path(os.getenv("FSM_SQLITE_FILE") or DATA_DIR / "fsm.sqlite3")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Seconds before an untouched questionnaire is dropped (0 keeps forever)
+FSM_TTL = float(os.getenv("FSM_TTL", str(24 * 60 * 60)))
+# SQLite FSM: seconds between batched writes (0 writes every change immediately)
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "1.0"))
+
+# "polling" or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Public https URL Telegram should call, e.g. https://bot.example.com (empty: don't call setWebhook)
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "80"))
+# Max updates handled at once in webhook mode
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "40"))
+
+# More than 1: main.py becomes a front process that receives updates (polling
+# or webhook) and forwards them, sharded by user id, to this many worker
+# processes on 127.0.0.1:WORKER_BASE_PORT+i. Needs STORAGE_BACKEND=sqlite.
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "8081"))
+# Set by the front process for the workers it starts
+BOT_WORKER_INDEX = int(os.environ["BOT_WORKER_INDEX"]) if os.getenv("BOT_WORKER_INDEX") else None
+
+# Outbound message queue (notify.Outbox)
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+# Telegram allows ~30 msg/s per bot and ~1 msg/s per chat; stay a bit below.
+# The global rate is for the whole bot and is split between BOT_WORKERS.
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "25"))
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+OUTBOX_CHAT_BURST = float(os.getenv("OUTBOX_CHAT_BURST", "3"))
+OUTBOX_MAX_PENDING = int(os.getenv("OUTBOX_MAX_PENDING", "10000"))
+# Batch request notifications per team owner over this many seconds (0 = send each one).
+# Batches are per worker: with BOT_WORKERS > 1 an owner may get one digest from each.
+REQUEST_DIGEST_WINDOW = float(os.getenv("REQUEST_DIGEST_WINDOW", "0"))
+
+# Admin /broadcast: checkpoints live here; rate stays below OUTBOX_GLOBAL_RATE to leave room for regular traffic.
+# Like the global rate it is for the whole bot and is split between BOT_WORKERS.
+BROADCAST_DIR = DATA_DIR / "broadcasts"
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "20"))
+
+# Prometheus text endpoint GET /metrics; keep it on a private interface (0 disables).
+# With BOT_WORKERS > 1 worker i serves it on METRICS_PORT + i.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
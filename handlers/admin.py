@@ -1,8 +1,11 @@
 from aiogram import F, Router
+from aiogram.filters import Command
 from aiogram.types import Message
 
 from config import ADMIN_IDS
-from storage import get_active_teams, get_requests, get_teams, get_users
+from notify import Broadcaster, format_report
+from keyboards.inline import SPECIALTIES
+from storage.aio import get_active_teams, get_active_users, get_stats
 
 router = Router(name="admin")
 
@@ -11,23 +14,66 @@ def _is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS
 
 
+def _rate(value: float | None) -> str:
+    return f"{value:.0%}" if value is not None else "—"
+
+
 @router.message(F.text.in_(["/admin", "/stats"]))
 async def cmd_admin_stats(message: Message) -> None:
     if not _is_admin(message.from_user.id):
         await message.answer("Нет доступа.")
         return
-    teams = get_teams()
-    active_teams = get_active_teams()
-    users = get_users()
-    active_users = [u for u in users.values() if u.get("is_active", True)]
-    requests = get_requests()
-    pending_requests = [r for r in requests.values() if r.get("status") == "pending"]
-    text = (
-        "<b>Статистика</b>\n\n"
-        f"Всего команд: {len(teams)}\n"
-        f"Команд в поиске: {len(active_teams)}\n"
-        f"Всего личных анкет: {len(users)}\n"
-        f"Активных анкет: {len(active_users)}\n"
-        f"Заявок в ожидании: {len(pending_requests)}"
+    stats = await get_stats()
+    users, teams, requests, invites = stats["users"], stats["teams"], stats["requests"], stats["invites"]
+    lines = [
+        "<b>Статистика</b>\n",
+        f"Всего команд: {teams['total']}",
+        f"Команд в поиске: {teams['active']}",
+        f"Команд на паузе: {teams['paused']}",
+        f"Всего личных анкет: {users['total']}",
+        f"Активных анкет: {users['active']}",
+        f"Заявок в ожидании: {requests['pending']}",
+        "\n<b>По специальностям</b> (активных / всего)",
+    ]
+    for specialty, counts in sorted(users["by_specialty"].items(), key=lambda item: -item[1]["total"]):
+        lines.append(f"{SPECIALTIES.get(specialty, specialty)}: {counts['active']} / {counts['total']}")
+    for title, c in (("Заявки", requests), ("Приглашения", invites)):
+        lines += [
+            f"\n<b>{title}</b>",
+            f"Всего: {c['total']} (ждут: {c['pending']}, приняты: {c['accepted']}, отклонены: {c['denied']})",
+            f"За текущий час: {c['this_hour']}, за 24 ч: {c['last_24h']} (~{c['last_24h'] / 24:.1f}/ч)",
+            f"Принимают: {_rate(c['acceptance_rate'])}",
+        ]
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: Message, broadcaster: Broadcaster) -> None:
+    if not _is_admin(message.from_user.id):
+        await message.answer("Нет доступа.")
+        return
+    parts = message.html_text.split(maxsplit=1)
+    if len(parts) < 2:
+        await message.answer("Использование: /broadcast текст сообщения\n\nПолучат все активные анкеты и команды.")
+        return
+    # Active solos first, then team owners; someone with both gets one copy.
+    recipients = [int(key) for key, _ in await get_active_users()]
+    recipients += [team["owner_id"] for _, team in await get_active_teams()]
+    recipients = list(dict.fromkeys(recipients))
+    job = await broadcaster.start(message.from_user.id, parts[1], recipients)
+    await message.answer(
+        f"Рассылка {job.job_id} запущена: {len(recipients)} получателей.\n"
+        "Прогресс: /broadcast_status. Отчёт придёт по завершении."
     )
-    await message.answer(text)
+
+
+@router.message(Command("broadcast_status"))
+async def cmd_broadcast_status(message: Message, broadcaster: Broadcaster) -> None:
+    if not _is_admin(message.from_user.id):
+        await message.answer("Нет доступа.")
+        return
+    jobs = broadcaster.running()
+    if not jobs:
+        await message.answer("Активных рассылок нет.")
+        return
+    await message.answer("\n\n".join(format_report(job) for job in jobs))
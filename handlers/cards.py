@@ -0,0 +1,101 @@
+"""Team and solo profile cards (text + keyboard), cached per profile version.
+
+Storage gives a record a new "version" (unique across all profiles, so a
+re-created team can't match an old card) on every change that shows on a
+card: save_user, save_team, toggle_team_pause. A cached card is reused
+exactly until its profile changes. Cached markups are shared: don't mutate.
+"""
+import html
+from collections import OrderedDict
+from typing import Callable
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from keyboards import get_solo_card_keyboard, get_team_card_keyboard, get_team_dashboard_keyboard
+from keyboards.inline import PARTICIPATION_FORMATS, ROLES, SPECIALTIES
+
+Card = tuple[str, InlineKeyboardMarkup]
+
+CACHE_SIZE = 4096
+_cache: OrderedDict[tuple, Card] = OrderedDict()
+
+
+def _cached(key: tuple, build: Callable[[], Card]) -> Card:
+    card = _cache.get(key)
+    if card is not None:
+        _cache.move_to_end(key)
+        return card
+    card = _cache[key] = build()
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return card
+
+
+def team_display_name(team: dict) -> str:
+    team_number = team.get("team_number")
+    return team.get("team_name", "") or (f"Команда #{team_number}" if team_number else "Команда")
+
+
+def _team_profile(team: dict) -> tuple[str, str, str]:
+    roles_labels = [ROLES.get(r, r) for r in team.get("roles_needed", [])]
+    roles_str = ", ".join(roles_labels) if roles_labels else "—"
+    pitch_str = "Онлайн" if team.get("pitch_format", "online") == "online" else "Офлайн"
+    return html.escape(team.get("description", "")), roles_str, pitch_str
+
+
+def team_menu_keyboard(owner_id: int, is_paused: bool) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        *get_team_dashboard_keyboard(owner_id, is_paused).inline_keyboard,
+        [InlineKeyboardButton(text="В главное меню", callback_data="start")],
+    ])
+
+
+def team_card(team: dict, page: int, total: int, cursor: str) -> Card:
+    """A team as solos browse it; cursor is its position for the paging buttons."""
+    def build() -> Card:
+        desc, roles_str, pitch_str = _team_profile(team)
+        text = (
+            f"<b>{html.escape(team_display_name(team))}</b> (страница {page + 1}/{total})\n\n{desc}\n\n"
+            f"<b>Ищут:</b> {roles_str}\n<b>Питчинг:</b> {pitch_str}"
+        )
+        kb = get_team_card_keyboard(team_owner_id=team["owner_id"], page=page, total=total, cursor=cursor)
+        kb.inline_keyboard.append([InlineKeyboardButton(text="В меню", callback_data="start")])
+        return text, kb
+
+    return _cached(("team", team["owner_id"], team.get("version", 0), page, total, cursor), build)
+
+
+def team_dashboard(team: dict) -> Card:
+    """The owner's own team with the management menu."""
+    def build() -> Card:
+        desc, roles_str, pitch_str = _team_profile(team)
+        is_paused = team.get("is_paused", False)
+        text = (
+            f"<b>{html.escape(team_display_name(team))}</b>\n\n{desc}\n\n"
+            f"<b>Ищете:</b> {roles_str}\n<b>Питчинг:</b> {pitch_str}\n\n"
+            f"Статус: {'поиск закрыт' if is_paused else 'в поиске'}"
+        )
+        return text, team_menu_keyboard(team["owner_id"], is_paused)
+
+    return _cached(("dashboard", team["owner_id"], team.get("version", 0)), build)
+
+
+def solo_card(solo: dict, page: int, total: int, cursor: str, filter_spec: str) -> Card:
+    """A solo participant as teams browse them."""
+    def build() -> Card:
+        display_name = solo.get("display_name") or solo.get("username") or "—"
+        fmt = solo.get("participation_format", "online")
+        spec = solo.get("specialty", "other")
+        text = (
+            f"<b>{html.escape(display_name)}</b> (страница {page + 1}/{total})\n"
+            f"Возраст: {solo.get('age_category', '18+')} | Формат: {PARTICIPATION_FORMATS.get(fmt, fmt)} | "
+            f"Специальность: {SPECIALTIES.get(spec, spec)}\n\n{html.escape(solo.get('description', ''))}"
+        )
+        kb = get_solo_card_keyboard(solo["user_id"], page, total, cursor, filter_spec)
+        kb.inline_keyboard.append([
+            InlineKeyboardButton(text="← К фильтру", callback_data="team:search_solos"),
+            InlineKeyboardButton(text="В меню", callback_data="mode:team"),
+        ])
+        return text, kb
+
+    return _cached(("solo", solo["user_id"], solo.get("version", 0), page, total, cursor, filter_spec), build)
@@ -2,21 +2,22 @@ import html
 
 from aiogram import F, Router
 
-from handlers.utils import safe_edit_text
+from handlers.utils import safe_edit_reply_markup, safe_edit_text
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 
+from handlers.cards import solo_card, team_dashboard, team_menu_keyboard
 from handlers.states import TeamForm
 from keyboards import (
     get_pitch_format_keyboard,
+    get_request_digest_keyboard,
     get_request_keyboard,
     get_roles_keyboard,
-    get_solo_card_keyboard,
     get_specialty_filter_keyboard,
-    get_team_dashboard_keyboard,
 )
-from keyboards.inline import PARTICIPATION_FORMATS, ROLES, SPECIALTIES
-from storage import (
+from matching import decode_cursor, encode_cursor, rank_solos_for_team, seek_solo_for_team, solo_rank_key
+from notify import Outbox
+from storage.aio import (
     create_invite,
     delete_team,
     get_active_users_by_specialty,
@@ -34,24 +35,11 @@ router = Router(name="team")
 
 @router.callback_query(F.data == "mode:team")
 async def mode_team(callback: CallbackQuery, state: FSMContext) -> None:
-    team = get_team(callback.from_user.id)
+    team = await get_team(callback.from_user.id)
     if team:
         await state.clear()
-        is_paused = team.get("is_paused", False)
-        team_name = team.get("team_name", "")
-        team_number = team.get("team_number")
-        display_name = team_name or (f"Команда #{team_number}" if team_number else "Команда")
-        desc = team.get("description", "")
-        roles_labels = [ROLES.get(r, r) for r in team.get("roles_needed", [])]
-        roles_str = ", ".join(roles_labels) if roles_labels else "—"
-        pitch = team.get("pitch_format", "online")
-        pitch_str = "Онлайн" if pitch == "online" else "Офлайн"
-        title = f"<b>{html.escape(display_name)}</b>"
-        await safe_edit_text(
-            callback.message,
-            f"{title}\n\n{html.escape(desc)}\n\n<b>Ищете:</b> {roles_str}\n<b>Питчинг:</b> {pitch_str}\n\nСтатус: {'поиск закрыт' if is_paused else 'в поиске'}",
-            reply_markup=_team_menu_keyboard(callback.from_user.id, is_paused),
-        )
+        text, kb = team_dashboard(team)
+        await safe_edit_text(callback.message, text, reply_markup=kb)
         await callback.answer()
         return
     await state.set_state(TeamForm.team_name)
@@ -119,7 +107,7 @@ async def team_role_toggle(callback: CallbackQuery, state: FSMContext) -> None:
     else:
         selected.append(role_id)
     await state.update_data(roles=selected)
-    await callback.message.edit_reply_markup(reply_markup=get_roles_keyboard(selected))
+    await safe_edit_reply_markup(callback.message, get_roles_keyboard(selected))
     await callback.answer()
 
 
@@ -133,7 +121,7 @@ async def team_roles_done(callback: CallbackQuery, state: FSMContext) -> None:
     team_name = data.get("team_name", "")
     description = data.get("description", "")
     pitch_format = data.get("pitch_format", "online")
-    save_team(
+    await save_team(
         owner_id=callback.from_user.id,
         owner_username=callback.from_user.username,
         team_name=team_name or "",
@@ -144,32 +132,26 @@ async def team_roles_done(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await callback.message.edit_text(
         "Команда зарегистрирована! Тебе будут приходить заявки от участников.",
-        reply_markup=_team_menu_keyboard(callback.from_user.id, is_paused=False),
+        reply_markup=team_menu_keyboard(callback.from_user.id, is_paused=False),
     )
     await callback.answer()
 
 
-def _team_menu_keyboard(owner_id: int, is_paused: bool) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(inline_keyboard=[
-        *get_team_dashboard_keyboard(owner_id, is_paused).inline_keyboard,
-        [InlineKeyboardButton(text="В главное меню", callback_data="start")],
-    ])
-
-
 @router.callback_query(F.data == "team:requests")
 async def team_requests(callback: CallbackQuery, state: FSMContext) -> None:
     owner_id = callback.from_user.id
-    pending = get_pending_requests(owner_id)
+    pending = await get_pending_requests(owner_id)
     if not pending:
+        team = await get_team(owner_id)
         await safe_edit_text(
             callback.message,
             "Нет новых заявок.",
-            reply_markup=_team_menu_keyboard(owner_id, get_team(owner_id) and get_team(owner_id).get("is_paused", False)),
+            reply_markup=team_menu_keyboard(owner_id, team and team.get("is_paused", False)),
         )
         await callback.answer()
         return
     req = pending[0]
-    solo = get_user(req["solo_id"])
+    solo = await get_user(req["solo_id"])
     display_name = solo.get("display_name") or solo.get("username") or "—" if solo else "—"
     desc = solo.get("description", "—") if solo else "—"
     text = f"<b>Заявка</b> от {html.escape(display_name)}\n\n{html.escape(desc)}"
@@ -198,7 +180,8 @@ def _team_back_to_search_keyboard(owner_id: int) -> InlineKeyboardMarkup:
 async def team_solofilter(callback: CallbackQuery, state: FSMContext) -> None:
     parts = callback.data.split(":", 2)
     filter_spec = parts[1] if len(parts) >= 2 else "all"
-    active = get_active_users_by_specialty(filter_spec if filter_spec != "all" else None)
+    team = await get_team(callback.from_user.id)
+    active = rank_solos_for_team(team, await get_active_users_by_specialty(filter_spec if filter_spec != "all" else None))
     total = len(active)
     if total == 0:
         await safe_edit_text(
@@ -208,38 +191,23 @@ async def team_solofilter(callback: CallbackQuery, state: FSMContext) -> None:
         )
         await callback.answer()
         return
-    page = 0
-    key, solo = active[page]
-    solo_id = solo["user_id"]
-    display_name = solo.get("display_name") or solo.get("username") or "—"
-    age = solo.get("age_category", "18+")
-    fmt = solo.get("participation_format", "online")
-    fmt_label = PARTICIPATION_FORMATS.get(fmt, fmt)
-    spec = solo.get("specialty", "other")
-    spec_label = SPECIALTIES.get(spec, spec)
-    desc = solo.get("description", "")
-    text = (
-        f"<b>{html.escape(display_name)}</b> (страница {page + 1}/{total})\n"
-        f"Возраст: {age} | Формат: {fmt_label} | Специальность: {spec_label}\n\n{html.escape(desc)}"
-    )
-    kb = get_solo_card_keyboard(solo_id, page, total, filter_spec)
-    kb.inline_keyboard.append([
-        InlineKeyboardButton(text="← К фильтру", callback_data="team:search_solos"),
-        InlineKeyboardButton(text="В меню", callback_data="mode:team"),
-    ])
+    text, kb = solo_card(active[0][1], 0, total, encode_cursor(solo_rank_key(team, active[0])), filter_spec)
     await safe_edit_text(callback.message, text, reply_markup=kb)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("solobrowse:"))
 async def team_solobrowse(callback: CallbackQuery, state: FSMContext) -> None:
-    parts = callback.data.split(":")
+    # solobrowse:{spec}:{n|p}:{cursor}, or solobrowse:{spec}:{page} from older
+    # buttons; see solo.browse_page.
+    parts = callback.data.split(":", 3)
     if len(parts) < 3:
         await callback.answer()
         return
-    filter_spec = parts[1]
-    page = int(parts[2])
-    active = get_active_users_by_specialty(filter_spec if filter_spec != "all" else None)
+    filter_spec, step = parts[1], parts[2]
+    team = await get_team(callback.from_user.id)
+    solos = await get_active_users_by_specialty(filter_spec if filter_spec != "all" else None)
+    active = rank_solos_for_team(team, solos)
     total = len(active)
     if total == 0:
         await safe_edit_text(
@@ -249,44 +217,31 @@ async def team_solobrowse(callback: CallbackQuery, state: FSMContext) -> None:
         )
         await callback.answer()
         return
-    page = max(0, min(page, total - 1))
-    key, solo = active[page]
-    solo_id = solo["user_id"]
-    display_name = solo.get("display_name") or solo.get("username") or "—"
-    age = solo.get("age_category", "18+")
-    fmt = solo.get("participation_format", "online")
-    fmt_label = PARTICIPATION_FORMATS.get(fmt, fmt)
-    spec = solo.get("specialty", "other")
-    spec_label = SPECIALTIES.get(spec, spec)
-    desc = solo.get("description", "")
-    text = (
-        f"<b>{html.escape(display_name)}</b> (страница {page + 1}/{total})\n"
-        f"Возраст: {age} | Формат: {fmt_label} | Специальность: {spec_label}\n\n{html.escape(desc)}"
-    )
-    kb = get_solo_card_keyboard(solo_id, page, total, filter_spec)
-    kb.inline_keyboard.append([
-        InlineKeyboardButton(text="← К фильтру", callback_data="team:search_solos"),
-        InlineKeyboardButton(text="В меню", callback_data="mode:team"),
-    ])
+    anchor = decode_cursor(parts[3]) if len(parts) == 4 else None
+    if anchor is not None:
+        page = seek_solo_for_team(team, solos, anchor, 1 if step == "n" else -1)
+    else:
+        page = max(0, min(int(step) if step.isdigit() else 0, total - 1))
+    text, kb = solo_card(active[page][1], page, total, encode_cursor(solo_rank_key(team, active[page])), filter_spec)
     await safe_edit_text(callback.message, text, reply_markup=kb)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("invite:"))
-async def team_invite_solo(callback: CallbackQuery, state: FSMContext) -> None:
+async def team_invite_solo(callback: CallbackQuery, state: FSMContext, outbox: Outbox) -> None:
     solo_id = int(callback.data.split(":")[-1])
     owner_id = callback.from_user.id
-    team = get_team(owner_id)
+    team = await get_team(owner_id)
     if not team:
         await callback.answer("Команда не найдена.", show_alert=True)
         return
-    invite_id = create_invite(owner_id, solo_id)
+    invite_id = await create_invite(owner_id, solo_id)
     if not invite_id:
         await callback.answer("Приглашение уже отправлено.", show_alert=True)
         return
     from keyboards import get_invite_keyboard
     team_name = team.get("team_name") or f"Команда #{team.get('team_number', '?')}"
-    await callback.bot.send_message(
+    outbox.send_message(
         solo_id,
         f"Команда «{html.escape(team_name)}» приглашает тебя!",
         reply_markup=get_invite_keyboard(invite_id),
@@ -299,29 +254,53 @@ async def team_invite_solo(callback: CallbackQuery, state: FSMContext) -> None:
     )
 
 
-@router.callback_query(F.data.startswith("accept:"))
-async def accept_request(callback: CallbackQuery, state: FSMContext) -> None:
-    request_id = callback.data.split(":")[-1]
-    req = get_request(request_id)
+async def _own_pending_request(callback: CallbackQuery, request_id: str) -> tuple[dict, dict] | None:
+    """Returns (request, team) if the caller may resolve the request, otherwise answers with an alert."""
+    req = await get_request(request_id)
     if not req or req["status"] != "pending":
         await callback.answer("Заявка уже обработана.", show_alert=True)
-        return
-    team = get_team(callback.from_user.id)
+        return None
+    team = await get_team(callback.from_user.id)
     if not team or req["team_owner_id"] != callback.from_user.id:
         await callback.answer("Это не твоя заявка.", show_alert=True)
-        return
-    update_request_status(request_id, "accepted")
-    solo = get_user(req["solo_id"])
+        return None
+    return req, team
+
+
+async def _resolve(callback: CallbackQuery, request_id: str, status: str) -> bool:
+    """Moves a pending request to `status`; False (with an alert) if a concurrent press got there first."""
+    if await update_request_status(request_id, status, expected="pending"):
+        return True
+    await callback.answer("Заявка уже обработана.", show_alert=True)
+    return False
+
+
+async def _accept(callback: CallbackQuery, req: dict, team: dict, outbox: Outbox) -> str | None:
+    """Accepts the request, notifies the solo and returns their contact (None if already resolved)."""
+    if not await _resolve(callback, req["request_id"], "accepted"):
+        return None
+    solo = await get_user(req["solo_id"])
     username = solo.get("username", "") if solo else ""
     if not username:
         username = f"пользователь (ID: {req['solo_id']})"
     else:
         username = f"@{username}"
     team_name = team.get("team_name") or f"Команда #{team.get('team_number', '?')}"
-    await callback.bot.send_message(
+    outbox.send_message(
         req["solo_id"],
         f"Поздравляю! Твою заявку приняла команда «{html.escape(team_name)}». Свяжутся с тобой.",
     )
+    return username
+
+
+@router.callback_query(F.data.startswith("accept:"))
+async def accept_request(callback: CallbackQuery, state: FSMContext, outbox: Outbox) -> None:
+    found = await _own_pending_request(callback, callback.data.split(":")[-1])
+    if not found:
+        return
+    username = await _accept(callback, *found, outbox)
+    if username is None:
+        return
     await safe_edit_text(callback.message, f"Заявка принята. Контакт: {username}")
     await callback.answer()
 
@@ -329,32 +308,103 @@ async def accept_request(callback: CallbackQuery, state: FSMContext) -> None:
 @router.callback_query(F.data.startswith("deny:"))
 async def deny_request(callback: CallbackQuery, state: FSMContext) -> None:
     request_id = callback.data.split(":")[-1]
-    req = get_request(request_id)
-    if not req or req["status"] != "pending":
-        await callback.answer("Заявка уже обработана.", show_alert=True)
+    if not await _own_pending_request(callback, request_id) or not await _resolve(callback, request_id, "denied"):
         return
-    team = get_team(callback.from_user.id)
-    if not team or req["team_owner_id"] != callback.from_user.id:
-        await callback.answer("Это не твоя заявка.", show_alert=True)
-        return
-    update_request_status(request_id, "denied")
     await safe_edit_text(callback.message, "Заявка отклонена.")
     await callback.answer()
 
 
+DIGEST_PAGE_SIZE = 5
+
+
+async def _render_request_digest(owner_id: int, page: int, header: str = "") -> tuple[str, InlineKeyboardMarkup] | None:
+    """One page of the owner's pending requests, or None if there are none left."""
+    pending = await get_pending_requests(owner_id)
+    if not pending:
+        return None
+    total = (len(pending) + DIGEST_PAGE_SIZE - 1) // DIGEST_PAGE_SIZE
+    page = max(0, min(page, total - 1))
+    first = page * DIGEST_PAGE_SIZE
+    chunk = pending[first:first + DIGEST_PAGE_SIZE]
+    lines = [header or f"<b>Заявки</b> (страница {page + 1}/{total})"]
+    for n, req in enumerate(chunk, start=first + 1):
+        solo = await get_user(req["solo_id"])
+        display_name = solo.get("display_name") or solo.get("username") or "—" if solo else "—"
+        desc = solo.get("description", "") if solo else ""
+        if len(desc) > 120:
+            desc = desc[:119] + "…"
+        lines.append(f"\n{n}. <b>{html.escape(display_name)}</b>")
+        if desc:
+            lines.append(html.escape(desc))
+    kb = get_request_digest_keyboard([r["request_id"] for r in chunk], first + 1, page, total)
+    kb.inline_keyboard.append([InlineKeyboardButton(text="В меню команды", callback_data="mode:team")])
+    return "\n".join(lines), kb
+
+
+async def send_request_digest(outbox: Outbox, owner_id: int, request_ids: list[str]) -> None:
+    """Digest flush callback: one message instead of one per request."""
+    rendered = await _render_request_digest(owner_id, 0, header=f"<b>Новых заявок: {len(request_ids)}</b>")
+    if rendered:
+        text, kb = rendered
+        outbox.send_message(owner_id, text, reply_markup=kb)
+
+
+async def _show_request_digest(callback: CallbackQuery, page: int) -> None:
+    rendered = await _render_request_digest(callback.from_user.id, page)
+    if rendered:
+        text, kb = rendered
+        await safe_edit_text(callback.message, text, reply_markup=kb)
+    else:
+        await safe_edit_text(
+            callback.message,
+            "Все заявки разобраны.",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="В меню команды", callback_data="mode:team")],
+            ]),
+        )
+
+
+@router.callback_query(F.data.startswith("digest:"))
+async def team_digest_page(callback: CallbackQuery, state: FSMContext) -> None:
+    await _show_request_digest(callback, int(callback.data.split(":")[-1]))
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("digest_accept:"))
+async def team_digest_accept(callback: CallbackQuery, state: FSMContext, outbox: Outbox) -> None:
+    _, page, request_id = callback.data.split(":", 2)
+    found = await _own_pending_request(callback, request_id)
+    if not found:
+        return
+    username = await _accept(callback, *found, outbox)
+    if username is None:
+        return
+    await _show_request_digest(callback, int(page))
+    await callback.answer(f"Заявка принята. Контакт: {username}", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("digest_deny:"))
+async def team_digest_deny(callback: CallbackQuery, state: FSMContext) -> None:
+    _, page, request_id = callback.data.split(":", 2)
+    if not await _own_pending_request(callback, request_id) or not await _resolve(callback, request_id, "denied"):
+        return
+    await _show_request_digest(callback, int(page))
+    await callback.answer("Заявка отклонена.")
+
+
 @router.callback_query(F.data == "team:toggle_pause")
 async def team_toggle_pause(callback: CallbackQuery, state: FSMContext) -> None:
     owner_id = callback.from_user.id
-    team = get_team(owner_id)
+    team = await get_team(owner_id)
     if not team:
         await callback.answer("Сначала зарегистрируй команду.", show_alert=True)
         return
-    is_paused = toggle_team_pause(owner_id)
+    is_paused = await toggle_team_pause(owner_id)
     status = "закрыт" if is_paused else "возобновлён"
     await safe_edit_text(
         callback.message,
         f"Поиск {status}. " + ("Команда не показывается в поиске." if is_paused else "Команда снова видна участникам."),
-        reply_markup=_team_menu_keyboard(owner_id, is_paused),
+        reply_markup=team_menu_keyboard(owner_id, is_paused),
     )
     await callback.answer()
 
@@ -373,7 +423,7 @@ async def team_delete_confirm(callback: CallbackQuery, state: FSMContext) -> Non
 @router.callback_query(F.data == "team:delete_yes")
 async def team_delete_yes(callback: CallbackQuery, state: FSMContext) -> None:
     owner_id = callback.from_user.id
-    if not delete_team(owner_id):
+    if not await delete_team(owner_id):
         await callback.answer("Анкета не найдена.", show_alert=True)
         return
     await state.clear()
@@ -386,25 +436,13 @@ async def team_delete_yes(callback: CallbackQuery, state: FSMContext) -> None:
 @router.callback_query(F.data == "team:delete_no")
 async def team_delete_no(callback: CallbackQuery, state: FSMContext) -> None:
     owner_id = callback.from_user.id
-    team = get_team(owner_id)
+    team = await get_team(owner_id)
     if not team:
         from keyboards import get_mode_keyboard
         from handlers.start import GREETING
         await safe_edit_text(callback.message, GREETING, reply_markup=get_mode_keyboard())
         await callback.answer()
         return
-    is_paused = team.get("is_paused", False)
-    team_name = team.get("team_name", "")
-    team_number = team.get("team_number")
-    display_name = team_name or (f"Команда #{team_number}" if team_number else "Команда")
-    desc = team.get("description", "")
-    roles_labels = [ROLES.get(r, r) for r in team.get("roles_needed", [])]
-    roles_str = ", ".join(roles_labels) if roles_labels else "—"
-    pitch = team.get("pitch_format", "online")
-    pitch_str = "Онлайн" if pitch == "online" else "Офлайн"
-    await safe_edit_text(
-        callback.message,
-        f"<b>{html.escape(display_name)}</b>\n\n{html.escape(desc)}\n\n<b>Ищете:</b> {roles_str}\n<b>Питчинг:</b> {pitch_str}\n\nСтатус: {'поиск закрыт' if is_paused else 'в поиске'}",
-        reply_markup=_team_menu_keyboard(owner_id, is_paused),
-    )
+    text, kb = team_dashboard(team)
+    await safe_edit_text(callback.message, text, reply_markup=kb)
     await callback.answer()
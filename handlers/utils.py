@@ -1,11 +1,35 @@
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.types import Message
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from metrics import edits_skipped_total
+from middlewares import EDIT_MEMO
 
 
 async def safe_edit_text(message: Message, text: str, **kwargs) -> None:
-    """Edit message text, silently ignoring 'message is not modified' errors."""
+    """Edit message text, skipping edits that wouldn't change it (see middlewares.EditMemo).
+
+    Telegram's 'message is not modified' error is still ignored for messages
+    the memo doesn't know (older ones, or after a restart).
+    """
+    if kwargs.keys() <= {"reply_markup"} and EDIT_MEMO.shows(
+        message.chat.id, message.message_id, text, kwargs.get("reply_markup")
+    ):
+        edits_skipped_total.inc(method="EditMessageText")
+        return
     try:
         await message.edit_text(text, **kwargs)
     except TelegramBadRequest as e:
         if "message is not modified" not in str(e):
             raise
+
+
+async def safe_edit_reply_markup(message: Message, reply_markup: InlineKeyboardMarkup | None) -> None:
+    """Like safe_edit_text, for the keyboard alone."""
+    if EDIT_MEMO.shows(message.chat.id, message.message_id, markup=reply_markup):
+        edits_skipped_total.inc(method="EditMessageReplyMarkup")
+        return
+    try:
+        await message.edit_reply_markup(reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
@@ -5,6 +5,7 @@ from .inline import (
     get_mode_keyboard,
     get_participation_format_keyboard,
     get_pitch_format_keyboard,
+    get_request_digest_keyboard,
     get_request_keyboard,
     get_roles_keyboard,
     get_solo_card_keyboard,
@@ -20,6 +21,7 @@ __all__ = [
     "get_roles_keyboard",
     "get_team_card_keyboard",
     "get_request_keyboard",
+    "get_request_digest_keyboard",
     "get_team_dashboard_keyboard",
     "get_age_keyboard",
     "get_participation_format_keyboard",
@@ -46,13 +46,22 @@ def get_roles_keyboard(selected: list[str]) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def get_team_card_keyboard(team_owner_id: int, page: int, total: int) -> InlineKeyboardMarkup:
+def _page_data(prefix: str, cursor: str, step: str, page: int) -> str:
+    """Cursor paging data ("<prefix>n:<cursor>"), or the page number if the cursor doesn't fit."""
+    data = f"{prefix}{step}:{cursor}"
+    if len(data.encode()) <= MAX_CALLBACK_DATA_LEN:
+        return data
+    return f"{prefix}{page + (1 if step == 'n' else -1)}"
+
+
+def get_team_card_keyboard(team_owner_id: int, page: int, total: int, cursor: str) -> InlineKeyboardMarkup:
+    """cursor: matching.encode_cursor of the card shown (see solo.browse_page)."""
     row1 = [InlineKeyboardButton(text="Отправить заявку", callback_data=f"request:{team_owner_id}")]
     row2 = []
     if page > 0:
-        row2.append(InlineKeyboardButton(text="← Назад", callback_data=f"browse:{page - 1}"))
+        row2.append(InlineKeyboardButton(text="← Назад", callback_data=_page_data("browse:", cursor, "p", page)))
     if page < total - 1:
-        row2.append(InlineKeyboardButton(text="Вперёд →", callback_data=f"browse:{page + 1}"))
+        row2.append(InlineKeyboardButton(text="Вперёд →", callback_data=_page_data("browse:", cursor, "n", page)))
     kb = [row1]
     if row2:
         kb.append(row2)
@@ -68,6 +77,24 @@ def get_request_keyboard(request_id: str) -> InlineKeyboardMarkup:
     ])
 
 
+def get_request_digest_keyboard(request_ids: list[str], first: int, page: int, total: int) -> InlineKeyboardMarkup:
+    """Accept/deny buttons for one page of a request digest; first is the number shown for request_ids[0]."""
+    rows = []
+    for n, request_id in enumerate(request_ids, start=first):
+        rows.append([
+            InlineKeyboardButton(text=f"✓ {n}", callback_data=f"digest_accept:{page}:{request_id}"),
+            InlineKeyboardButton(text=f"✗ {n}", callback_data=f"digest_deny:{page}:{request_id}"),
+        ])
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="← Назад", callback_data=f"digest:{page - 1}"))
+    if page < total - 1:
+        nav.append(InlineKeyboardButton(text="Вперёд →", callback_data=f"digest:{page + 1}"))
+    if nav:
+        rows.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
 def get_team_dashboard_keyboard(owner_id: int, is_paused: bool) -> InlineKeyboardMarkup:
     pause_text = "Возобновить поиск" if is_paused else "Закрыть поиск"  # when not paused, show "Закрыть"
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -110,13 +137,16 @@ def get_team_name_skip_keyboard() -> InlineKeyboardMarkup:
     ])
 
 
-def get_solo_card_keyboard(solo_id: int, page: int, total: int, filter_spec: str = "all") -> InlineKeyboardMarkup:
+def get_solo_card_keyboard(
+    solo_id: int, page: int, total: int, cursor: str, filter_spec: str = "all"
+) -> InlineKeyboardMarkup:
+    prefix = f"solobrowse:{filter_spec}:"
     row1 = [InlineKeyboardButton(text="Пригласить в команду", callback_data=f"invite:{solo_id}")]
     row2 = []
     if page > 0:
-        row2.append(InlineKeyboardButton(text="← Назад", callback_data=f"solobrowse:{filter_spec}:{page - 1}"))
+        row2.append(InlineKeyboardButton(text="← Назад", callback_data=_page_data(prefix, cursor, "p", page)))
     if page < total - 1:
-        row2.append(InlineKeyboardButton(text="Вперёд →", callback_data=f"solobrowse:{filter_spec}:{page + 1}"))
+        row2.append(InlineKeyboardButton(text="Вперёд →", callback_data=_page_data(prefix, cursor, "n", page)))
     kb = [row1]
     if row2:
         kb.append(row2)
@@ -1,14 +1,39 @@
 import asyncio
 import logging
 import sys
+from functools import partial
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN
+from cluster import run_front, run_worker, shard_of
+from config import (
+    BOT_MODE,
+    BOT_TOKEN,
+    BOT_WORKER_INDEX,
+    BOT_WORKERS,
+    BROADCAST_DIR,
+    BROADCAST_RATE,
+    METRICS_HOST,
+    METRICS_PORT,
+    OUTBOX_CHAT_BURST,
+    OUTBOX_CHAT_RATE,
+    OUTBOX_GLOBAL_RATE,
+    OUTBOX_MAX_PENDING,
+    OUTBOX_WORKERS,
+    REQUEST_DIGEST_WINDOW,
+    STORAGE_BACKEND,
+)
 from handlers import admin_router, common_router, solo_router, start_router, team_router
+from handlers.team import send_request_digest
+from metrics import outbox_pending
+from metrics.http import start_metrics_server
+from middlewares import EditMemoMiddleware, ThrottlingMiddleware, setup_metrics
+from notify import Broadcaster, Digest, Outbox
+from storage import flush_writes, start_writer
+from storage.fsm import create_fsm_storage
+from webhook import run_webhook
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,15 +47,75 @@ async def main() -> None:
     if not BOT_TOKEN:
         logger.error("BOT_TOKEN not set. Create .env file from .env.example")
         sys.exit(1)
+    if BOT_WORKERS > 1 and STORAGE_BACKEND != "sqlite":
+        logger.error("BOT_WORKERS > 1 needs STORAGE_BACKEND=sqlite (see storage.migrate)")
+        sys.exit(1)
     bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    dp = Dispatcher(storage=MemoryStorage())
+    front = BOT_WORKERS > 1 and BOT_WORKER_INDEX is None
+    # The front only forwards raw updates; FSM state is kept by the workers.
+    dp = Dispatcher() if front else Dispatcher(storage=create_fsm_storage())
     dp.include_router(start_router)
     dp.include_router(solo_router)
     dp.include_router(team_router)
     dp.include_router(admin_router)
     dp.include_router(common_router)
-    logger.info("Bot starting...")
-    await dp.start_polling(bot)
+    if front:
+        try:
+            await run_front(bot, dp.resolve_used_update_types())
+        finally:
+            await bot.session.close()
+        return
+    setup_metrics(dp, bot)
+    # On dp.update ahead of build_app's PerUserOrderMiddleware, see ThrottlingMiddleware.
+    dp.update.outer_middleware(ThrottlingMiddleware())
+    bot.session.middleware(EditMemoMiddleware())
+    outbox = Outbox(
+        bot,
+        workers=OUTBOX_WORKERS,
+        global_rate=OUTBOX_GLOBAL_RATE / BOT_WORKERS,
+        chat_rate=OUTBOX_CHAT_RATE,
+        chat_burst=OUTBOX_CHAT_BURST,
+        max_pending=OUTBOX_MAX_PENDING,
+    )
+    # Handlers receive these as the `outbox`, `broadcaster` and `request_digest` arguments.
+    dp["outbox"] = outbox
+    broadcaster = Broadcaster(outbox, BROADCAST_DIR, rate=BROADCAST_RATE / BOT_WORKERS)
+    dp["broadcaster"] = broadcaster
+    request_digest = None
+    if REQUEST_DIGEST_WINDOW > 0:
+        request_digest = Digest(REQUEST_DIGEST_WINDOW, partial(send_request_digest, outbox))
+    dp["request_digest"] = request_digest
+    outbox_pending.fn = outbox.__len__
+    logger.info("Bot starting in %s mode...", "worker" if BOT_WORKER_INDEX is not None else BOT_MODE)
+    start_writer()
+    outbox.start()
+    if BOT_WORKER_INDEX is None:
+        broadcaster.resume()
+    else:
+        # Each job is resumed by the worker its admin's updates go to.
+        broadcaster.resume(lambda job: shard_of(job.admin_id, BOT_WORKERS) == BOT_WORKER_INDEX)
+    metrics_port = METRICS_PORT + (BOT_WORKER_INDEX or 0) if METRICS_PORT else 0
+    metrics_server = await start_metrics_server(METRICS_HOST, metrics_port) if metrics_port else None
+    try:
+        if BOT_WORKER_INDEX is not None:
+            await run_worker(bot, dp, BOT_WORKER_INDEX)
+        elif BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            # A webhook left over from a previous deploy blocks getUpdates.
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        await broadcaster.close()
+        if request_digest is not None:
+            await request_digest.close()
+        await outbox.close()
+        # Draining may have reopened the HTTP session polling/webhook closed.
+        await bot.session.close()
+        await dp.storage.close()
+        await flush_writes()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,22 @@
+from .cursor import decode_cursor, encode_cursor
+from .engine import (
+    rank_solos_for_team,
+    rank_teams_for_solo,
+    score,
+    seek_solo_for_team,
+    seek_team_for_solo,
+    solo_rank_key,
+    team_rank_key,
+)
+
+__all__ = [
+    "rank_teams_for_solo",
+    "rank_solos_for_team",
+    "score",
+    "team_rank_key",
+    "solo_rank_key",
+    "seek_team_for_solo",
+    "seek_solo_for_team",
+    "encode_cursor",
+    "decode_cursor",
+]
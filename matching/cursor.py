@@ -0,0 +1,29 @@
+"""Compact text form of a rank key for callback_data: "<score>.<created_us base36>.<key>"."""
+from .engine import RankKey
+
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _base36(n: int) -> str:
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = _DIGITS[r] + out
+        if not n:
+            return out
+
+
+def encode_cursor(key: RankKey) -> str:
+    score, created, item_key = key
+    return f"{score}.{_base36(created)}.{item_key}"
+
+
+def decode_cursor(text: str) -> RankKey | None:
+    """The rank key, or None for anything that isn't a cursor (e.g. an old page number)."""
+    parts = text.split(".", 2)
+    if len(parts) != 3:
+        return None
+    try:
+        return int(parts[0]), int(parts[1], 36), parts[2]
+    except ValueError:
+        return None
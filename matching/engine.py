@@ -0,0 +1,183 @@
+"""Compatibility ranking of teams for a solo and of solos for a team.
+
+Every profile is reduced to a small bit vector:
+
+    bits 0-3  roles (designer, programmer, music, other)
+    bits 4-5  format (online, offline): team pitch_format / solo participation_format
+    bits 6-7  age category (18-, 18+), if the profile has one
+
+The score of a pair is read from a 256-entry table indexed by
+viewer_vector & candidate_vector: 4 for a role the team needs, 2 for the
+same format, 1 for the same age category. Ties go to the newer profile,
+then to the larger key, so every candidate has a distinct rank key
+(score, created_at in microseconds, key) and a ranking is that key, descending.
+
+Vectors and the recency order are computed once per candidate snapshot
+(storage returns the same list object until the data changes), and a
+ranking is cached per (snapshot, viewer vector). Viewers with the same
+vector share one ranking, so a page press is a dict lookup. Paging by
+cursor (seek_*) bisects the ranking's keys for the card next to a rank key,
+which still works after that card was paused or removed.
+"""
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+ROLE_BITS = {"designer": 1 << 0, "programmer": 1 << 1, "music": 1 << 2, "other": 1 << 3}
+FORMAT_BITS = {"online": 1 << 4, "offline": 1 << 5}
+AGE_BITS = {"18-": 1 << 6, "18+": 1 << 7}
+
+ROLE_MASK = 0b0000_1111
+FORMAT_MASK = 0b0011_0000
+AGE_MASK = 0b1100_0000
+
+# Which team role a solo specialty fills.
+SPECIALTY_ROLES = {
+    "gamedesign": "other",
+    "designer": "designer",
+    "programmer": "programmer",
+    "artist": "designer",
+    "sound": "music",
+    "producer": "other",
+    "other": "other",
+}
+
+MAX_SCORE = 7
+_SCORES = [
+    (4 if m & ROLE_MASK else 0) + (2 if m & FORMAT_MASK else 0) + (1 if m & AGE_MASK else 0)
+    for m in range(256)
+]
+
+
+def team_vector(team: dict) -> int:
+    vec = 0
+    for role in team.get("roles_needed", []):
+        vec |= ROLE_BITS.get(role, 0)
+    vec |= FORMAT_BITS.get(team.get("pitch_format", "online"), 0)
+    vec |= AGE_BITS.get(team.get("age_category", ""), 0)
+    return vec
+
+
+def solo_vector(solo: dict) -> int:
+    vec = ROLE_BITS[SPECIALTY_ROLES.get(solo.get("specialty", "other"), "other")]
+    vec |= FORMAT_BITS.get(solo.get("participation_format", "online"), 0)
+    vec |= AGE_BITS.get(solo.get("age_category", "18+"), 0)
+    return vec
+
+
+RankKey = tuple[int, int, str]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def created_us(record: dict) -> int:
+    """created_at as microseconds since the epoch (0 if missing or malformed)."""
+    try:
+        return (datetime.fromisoformat(record.get("created_at", "")) - _EPOCH) // timedelta(microseconds=1)
+    except (TypeError, ValueError):
+        return 0
+
+
+def score(team: dict, solo: dict) -> int:
+    """Compatibility of a team and a solo, 0..MAX_SCORE."""
+    return _SCORES[team_vector(team) & solo_vector(solo)]
+
+
+class _Ranker:
+    def __init__(self, vector, maxsize: int = 512) -> None:
+        self._vector = vector
+        self._maxsize = maxsize
+        # id(candidates) -> (candidates, [(vector, created_us, item), ...] newest first)
+        self._prepared: OrderedDict[int, tuple[list, list[tuple[int, int, tuple]]]] = OrderedDict()
+        # (id(candidates), viewer vector) -> (candidates, ranked list, its rank keys ascending)
+        self._ranked: OrderedDict[tuple[int, int], tuple[list, list, list[RankKey]]] = OrderedDict()
+
+    def _prepare(self, candidates: list[tuple[str, dict]]) -> list[tuple[int, int, tuple]]:
+        hit = self._prepared.get(id(candidates))
+        if hit is not None and hit[0] is candidates:
+            self._prepared.move_to_end(id(candidates))
+            return hit[1]
+        prepared = [(self._vector(item[1]), created_us(item[1]), item) for item in candidates]
+        prepared.sort(key=lambda p: (p[1], p[2][0]), reverse=True)
+        self._prepared[id(candidates)] = (candidates, prepared)
+        if len(self._prepared) > self._maxsize:
+            self._prepared.popitem(last=False)
+        return prepared
+
+    def _ranking(self, viewer_vec: int, candidates: list[tuple[str, dict]]) -> tuple[list, list, list[RankKey]]:
+        key = (id(candidates), viewer_vec)
+        hit = self._ranked.get(key)
+        if hit is not None and hit[0] is candidates:
+            self._ranked.move_to_end(key)
+            return hit
+        # Scores are tiny ints, so bucket them instead of sorting: O(n), and
+        # each bucket keeps the newest-first order.
+        buckets: list[list[tuple[int, tuple]]] = [[] for _ in range(MAX_SCORE + 1)]
+        scores = _SCORES
+        for vec, created, item in self._prepare(candidates):
+            buckets[scores[viewer_vec & vec]].append((created, item))
+        ranked = []
+        keys = []
+        for s in range(MAX_SCORE, -1, -1):
+            for created, item in buckets[s]:
+                ranked.append(item)
+                keys.append((s, created, item[0]))
+        keys.reverse()
+        hit = self._ranked[key] = (candidates, ranked, keys)
+        if len(self._ranked) > self._maxsize:
+            self._ranked.popitem(last=False)
+        return hit
+
+    def rank(self, viewer_vec: int, candidates: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+        return self._ranking(viewer_vec, candidates)[1]
+
+    def key_of(self, viewer_vec: int, item: tuple[str, dict]) -> RankKey:
+        return _SCORES[viewer_vec & self._vector(item[1])], created_us(item[1]), item[0]
+
+    def seek(self, viewer_vec: int, candidates: list[tuple[str, dict]], anchor: RankKey, step: int) -> int:
+        """Index of the card after (step > 0) or before (step < 0) the anchor key, clamped to the ranking.
+
+        O(log n). The anchor itself doesn't have to be in the ranking anymore.
+        """
+        keys = self._ranking(viewer_vec, candidates)[2]
+        if step > 0:
+            index = len(keys) - bisect_left(keys, anchor)
+        else:
+            index = len(keys) - bisect_right(keys, anchor) - 1
+        return max(0, min(index, len(keys) - 1))
+
+
+_teams = _Ranker(team_vector)
+_solos = _Ranker(solo_vector)
+
+
+def rank_teams_for_solo(solo: dict | None, teams: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+    """Orders (team_key, team) pairs by fit for the solo, best first.
+
+    Without a solo profile only recency counts. The result is cached and
+    shared; don't mutate it.
+    """
+    return _teams.rank(solo_vector(solo) if solo else 0, teams)
+
+
+def rank_solos_for_team(team: dict | None, solos: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+    """Orders (user_key, user) pairs by fit for the team, best first."""
+    return _solos.rank(team_vector(team) if team else 0, solos)
+
+
+def team_rank_key(solo: dict | None, item: tuple[str, dict]) -> RankKey:
+    """Where a (team_key, team) pair sits in rank_teams_for_solo(solo, ...)."""
+    return _teams.key_of(solo_vector(solo) if solo else 0, item)
+
+
+def solo_rank_key(team: dict | None, item: tuple[str, dict]) -> RankKey:
+    return _solos.key_of(team_vector(team) if team else 0, item)
+
+
+def seek_team_for_solo(solo: dict | None, teams: list[tuple[str, dict]], anchor: RankKey, step: int) -> int:
+    """Index in rank_teams_for_solo(solo, teams) of the card `step` (+1/-1) from the anchor."""
+    return _teams.seek(solo_vector(solo) if solo else 0, teams, anchor, step)
+
+
+def seek_solo_for_team(team: dict | None, solos: list[tuple[str, dict]], anchor: RankKey, step: int) -> int:
+    return _solos.seek(team_vector(team) if team else 0, solos, anchor, step)
@@ -0,0 +1,43 @@
+from .definitions import (
+    api_errors_total,
+    api_seconds,
+    callbacks_throttled_total,
+    edits_skipped_total,
+    handler_errors_total,
+    handler_seconds,
+    outbox_pending,
+    storage_cache_hits_total,
+    storage_journal_appends_total,
+    storage_read_bytes,
+    storage_read_seconds,
+    storage_write_bytes,
+    storage_write_seconds,
+    update_errors_total,
+    update_seconds,
+    updates_total,
+)
+from .registry import REGISTRY, Counter, Gauge, Histogram, Registry
+
+__all__ = [
+    "REGISTRY",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "api_errors_total",
+    "api_seconds",
+    "callbacks_throttled_total",
+    "edits_skipped_total",
+    "handler_errors_total",
+    "handler_seconds",
+    "outbox_pending",
+    "storage_cache_hits_total",
+    "storage_journal_appends_total",
+    "storage_read_bytes",
+    "storage_read_seconds",
+    "storage_write_bytes",
+    "storage_write_seconds",
+    "update_errors_total",
+    "update_seconds",
+    "updates_total",
+]
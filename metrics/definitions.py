@@ -0,0 +1,30 @@
+"""Every metric the bot exports, in one place."""
+from .registry import counter, gauge, histogram
+
+# Byte-sized buckets for storage payloads: 1 KiB .. 64 MiB.
+SIZE_BUCKETS = tuple(float(1024 * 4 ** i) for i in range(9))
+
+updates_total = counter("bot_updates_total", "Updates received, by update type.", ("type",))
+update_seconds = histogram("bot_update_seconds", "Time to process one update end to end.", ("type",))
+update_errors_total = counter("bot_update_errors_total", "Updates whose processing raised.", ("type",))
+
+handler_seconds = histogram("bot_handler_seconds", "Handler latency.", ("handler",))
+handler_errors_total = counter("bot_handler_errors_total", "Handlers that raised.", ("handler", "error"))
+callbacks_throttled_total = counter(
+    "bot_callbacks_throttled_total", "Button presses answered without handling.", ("rule", "reason")
+)
+
+api_seconds = histogram("telegram_api_seconds", "Bot API call latency.", ("method",))
+api_errors_total = counter("telegram_api_errors_total", "Failed Bot API calls.", ("method", "error"))
+edits_skipped_total = counter(
+    "telegram_edits_skipped_total", "Edits skipped because they wouldn't change the message.", ("method",)
+)
+
+storage_read_seconds = histogram("storage_read_seconds", "Parsing a storage file from disk.", ("file",))
+storage_read_bytes = histogram("storage_read_bytes", "Size of storage files read from disk.", ("file",), SIZE_BUCKETS)
+storage_cache_hits_total = counter("storage_cache_hits_total", "Storage reads served from memory.", ("file",))
+storage_write_seconds = histogram("storage_write_seconds", "Writing a storage file to disk.", ("file",))
+storage_write_bytes = histogram("storage_write_bytes", "Size of storage files written.", ("file",), SIZE_BUCKETS)
+storage_journal_appends_total = counter("storage_journal_appends_total", "Events appended to journals.", ("file",))
+
+outbox_pending = gauge("outbox_pending", "Messages waiting in the outbound queue.")
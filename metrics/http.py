@@ -0,0 +1,22 @@
+from aiohttp import web
+
+from .registry import REGISTRY, Registry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics_app(registry: Registry = REGISTRY) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    return app
+
+
+async def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY) -> web.AppRunner:
+    """Serves GET /metrics on host:port. Stop with `await runner.cleanup()`."""
+    runner = web.AppRunner(metrics_app(registry), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,19 @@
+from .concurrency import ConcurrencyLimitMiddleware
+from .edits import EDIT_MEMO, EditMemo, EditMemoMiddleware
+from .metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware, UpdateMetricsMiddleware, setup_metrics
+from .ordering import PerUserOrderMiddleware
+from .throttling import ThrottleRule, ThrottlingMiddleware
+
+__all__ = [
+    "EDIT_MEMO",
+    "ApiMetricsMiddleware",
+    "ConcurrencyLimitMiddleware",
+    "EditMemo",
+    "EditMemoMiddleware",
+    "HandlerMetricsMiddleware",
+    "PerUserOrderMiddleware",
+    "ThrottleRule",
+    "ThrottlingMiddleware",
+    "UpdateMetricsMiddleware",
+    "setup_metrics",
+]
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    DeleteMessage,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    Response,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+from aiogram.types import InlineKeyboardMarkup
+
+_UNKNOWN = object()
+_TRACKED = (EditMessageText, EditMessageReplyMarkup, EditMessageCaption, EditMessageMedia, DeleteMessage)
+
+
+def _markup_key(markup: InlineKeyboardMarkup | None) -> int:
+    return hash(markup.model_dump_json(exclude_none=True)) if markup is not None else 0
+
+
+class EditMemo:
+    """What each recent message currently shows, as hashes of its text and keyboard.
+
+    Bounded LRU keyed by (chat_id, message_id). Filled by EditMemoMiddleware
+    from every successful edit, so edits made without safe_edit_text keep it
+    accurate too.
+    """
+
+    def __init__(self, size: int = 10000) -> None:
+        self.size = size
+        self._shown: OrderedDict[tuple[int, int], tuple[object, object]] = OrderedDict()
+
+    def shows(self, chat_id: int, message_id: int, text: object = _UNKNOWN, markup: object = _UNKNOWN) -> bool:
+        """True if the message already shows `text` (when given) and `markup` (when given)."""
+        shown = self._shown.get((chat_id, message_id))
+        if shown is None:
+            return False
+        return (text is _UNKNOWN or shown[0] == hash(text)) and (markup is _UNKNOWN or shown[1] == _markup_key(markup))
+
+    def record(self, chat_id: int, message_id: int, text: object = _UNKNOWN, markup: object = _UNKNOWN) -> None:
+        key = (chat_id, message_id)
+        old_text, old_markup = self._shown.pop(key, (_UNKNOWN, _UNKNOWN))
+        self._shown[key] = (
+            hash(text) if text is not _UNKNOWN else old_text,
+            _markup_key(markup) if markup is not _UNKNOWN else old_markup,
+        )
+        if len(self._shown) > self.size:
+            self._shown.popitem(last=False)
+
+    def forget(self, chat_id: int, message_id: int) -> None:
+        self._shown.pop((chat_id, message_id), None)
+
+
+EDIT_MEMO = EditMemo()
+
+
+class EditMemoMiddleware(BaseRequestMiddleware):
+    """Bot session middleware keeping EDIT_MEMO in sync with what messages show."""
+
+    def __init__(self, memo: EditMemo = EDIT_MEMO) -> None:
+        self.memo = memo
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not isinstance(method, _TRACKED):
+            return await make_request(bot, method)
+        chat_id, message_id = method.chat_id, method.message_id
+        if not isinstance(chat_id, int) or message_id is None:  # inline messages, @channel usernames
+            return await make_request(bot, method)
+        try:
+            response = await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                self.memo.forget(chat_id, message_id)
+                raise
+            self._record(method, chat_id, message_id)
+            raise
+        except Exception:
+            self.memo.forget(chat_id, message_id)
+            raise
+        self._record(method, chat_id, message_id)
+        return response
+
+    def _record(self, method: TelegramMethod, chat_id: int, message_id: int) -> None:
+        if isinstance(method, EditMessageText):
+            self.memo.record(chat_id, message_id, method.text, method.reply_markup)
+        elif isinstance(method, EditMessageReplyMarkup):
+            self.memo.record(chat_id, message_id, markup=method.reply_markup)
+        else:
+            self.memo.forget(chat_id, message_id)
@@ -0,0 +1,91 @@
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+from metrics import (
+    api_errors_total,
+    api_seconds,
+    handler_errors_total,
+    handler_seconds,
+    update_errors_total,
+    update_seconds,
+    updates_total,
+)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer update middleware: counts updates and times them end to end."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type
+        updates_total.inc(type=update_type)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            update_errors_total.inc(type=update_type)
+            raise
+        finally:
+            update_seconds.observe(time.perf_counter() - start, type=update_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: latency and errors per handler (e.g. "solo.send_request")."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        callback = data["handler"].callback
+        name = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            handler_errors_total.inc(handler=name, error=type(e).__name__)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - start, handler=name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Bot session middleware: latency and errors of outgoing Bot API calls."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            api_errors_total.inc(method=name, error=type(e).__name__)
+            raise
+        finally:
+            api_seconds.observe(time.perf_counter() - start, method=name)
+
+
+def setup_metrics(dp: Dispatcher, bot: Bot) -> None:
+    """Installs the metrics middlewares. Call after all routers are included."""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    # Inner middlewares of the dispatcher also wrap handlers of included routers.
+    handler_metrics = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handler_metrics)
+    bot.session.middleware(ApiMetricsMiddleware())
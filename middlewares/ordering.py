@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class PerUserOrderMiddleware(BaseMiddleware):
+    """Handles each user's updates one at a time, in the order they arrived.
+
+    The webhook handler runs every update as its own task, so without this two
+    updates of one user (a double tap, a message right after a button) could
+    interleave and race on FSM state. Updates of different users still run
+    concurrently. Register as an outer update middleware, after
+    ThrottlingMiddleware (queued presses must still be coalesced) and before
+    ConcurrencyLimitMiddleware (waiting updates mustn't hold its slots).
+    """
+
+    def __init__(self) -> None:
+        # user/chat id -> [lock, number of updates holding or waiting for it]
+        self._users: dict[int, list] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        sender = data.get("event_from_user") or data.get("event_chat")
+        if sender is None:
+            return await handler(event, data)
+        entry = self._users.get(sender.id)
+        if entry is None:
+            entry = self._users[sender.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await handler(event, data)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._users[sender.id]
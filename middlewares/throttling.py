@@ -0,0 +1,121 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject, Update
+
+from metrics import callbacks_throttled_total
+from notify import TokenBucket
+
+
+class ThrottleRule:
+    """Limits for callbacks whose data starts with one of `prefixes`, counted per user.
+
+    rate/burst: presses per second and how many may come at once; the rest
+    are answered with a hint and not handled.
+    coalesce: while one press is being handled, only the latest of the
+    presses that arrive meanwhile runs next; older ones are answered as is.
+    Meant for navigation, where only the page the user ends up on matters.
+    """
+
+    __slots__ = ("name", "prefixes", "rate", "burst", "coalesce")
+
+    def __init__(
+        self, name: str, prefixes: tuple[str, ...], rate: float = 0, burst: float = 1, coalesce: bool = False
+    ) -> None:
+        self.name = name
+        self.prefixes = prefixes
+        self.rate = rate
+        self.burst = burst
+        self.coalesce = coalesce
+
+
+DEFAULT_RULES = (
+    ThrottleRule("solo_browse", ("browse:", "solo:browse:"), coalesce=True),
+    ThrottleRule("team_browse", ("solobrowse:", "solofilter:"), coalesce=True),
+    ThrottleRule("digest", ("digest:",), coalesce=True),
+    ThrottleRule("role_toggle", ("role:",), rate=3, burst=5),
+)
+
+
+class _Slot:
+    __slots__ = ("busy", "pending")
+
+    def __init__(self) -> None:
+        self.busy = False
+        self.pending: asyncio.Future | None = None
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Outer update (or callback_query) middleware that absorbs button spam, see ThrottleRule.
+
+    Register it on dp.update before build_app adds PerUserOrderMiddleware:
+    behind that lock a user's presses would arrive one by one and never be
+    coalesced. State is per process; with BOT_WORKERS > 1 a user's presses
+    all reach the same worker, so the limits still hold.
+    """
+
+    def __init__(self, rules: tuple[ThrottleRule, ...] = DEFAULT_RULES, max_buckets: int = 10000) -> None:
+        self.rules = rules
+        self.max_buckets = max_buckets
+        self._buckets: dict[tuple[str, int], TokenBucket] = {}
+        self._slots: dict[tuple[str, int], _Slot] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        query = event.callback_query if isinstance(event, Update) else event
+        if not isinstance(query, CallbackQuery):
+            return await handler(event, data)
+        rule = self._rule_for(query.data or "")
+        if rule is None:
+            return await handler(event, data)
+        key = (rule.name, query.from_user.id)
+        if rule.rate and not self._allow(key, rule):
+            callbacks_throttled_total.inc(rule=rule.name, reason="rate")
+            await query.answer("Слишком часто, подожди секунду.")
+            return None
+        if not rule.coalesce:
+            return await handler(event, data)
+        slot = self._slots.setdefault(key, _Slot())
+        if slot.busy:
+            if slot.pending is not None and not slot.pending.done():
+                slot.pending.set_result(False)
+            slot.pending = asyncio.get_running_loop().create_future()
+            if not await slot.pending:
+                callbacks_throttled_total.inc(rule=rule.name, reason="coalesced")
+                await query.answer()
+                return None
+        # Either the slot was free or the previous press handed it over to us.
+        slot.busy = True
+        try:
+            return await handler(event, data)
+        finally:
+            if slot.pending is not None and not slot.pending.done():
+                slot.pending.set_result(True)
+            else:
+                slot.busy = False
+                slot.pending = None
+                del self._slots[key]
+
+    def _rule_for(self, data: str) -> ThrottleRule | None:
+        for rule in self.rules:
+            if data.startswith(rule.prefixes):
+                return rule
+        return None
+
+    def _allow(self, key: tuple[str, int], rule: ThrottleRule) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                # Full buckets carry no state worth keeping.
+                for stale in [k for k, b in self._buckets.items() if b.full()]:
+                    del self._buckets[stale]
+            bucket = self._buckets[key] = TokenBucket(rule.rate, rule.burst)
+        if bucket.delay() > 0:
+            return False
+        bucket.take()
+        return True
@@ -0,0 +1,6 @@
+from .broadcast import Broadcaster, BroadcastJob, format_report
+from .buckets import TokenBucket
+from .digest import Digest
+from .outbox import Outbox
+
+__all__ = ["BroadcastJob", "Broadcaster", "Digest", "Outbox", "TokenBucket", "format_report"]
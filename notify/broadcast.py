@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Callable
+
+from storage.executor import executor
+from storage.writer import write_atomic
+
+from .buckets import TokenBucket
+from .outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastJob:
+    """Progress of one broadcast, checkpointed as to_dict(); the recipient list is saved separately, once."""
+
+    def __init__(self, job_id: str, admin_id: int, text: str, recipients: list[int]) -> None:
+        self.job_id = job_id
+        self.admin_id = admin_id
+        self.text = text
+        self.recipients = recipients
+        # Recipients before `cursor` are settled (sent or failed).
+        self.cursor = 0
+        self.sent = 0
+        self.failed = 0
+        self.started_at = time.time()
+        self.elapsed = 0.0
+        self.done = False
+
+    @property
+    def rate(self) -> float:
+        return (self.sent + self.failed) / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in (
+            "job_id", "admin_id", "text", "cursor", "sent", "failed", "started_at", "elapsed", "done",
+        )}
+
+    @classmethod
+    def from_dict(cls, data: dict, recipients: list[int]) -> "BroadcastJob":
+        job = cls(data["job_id"], data["admin_id"], data["text"], recipients)
+        for key in ("cursor", "sent", "failed", "started_at", "elapsed", "done"):
+            setattr(job, key, data[key])
+        return job
+
+
+class Broadcaster:
+    """Runs broadcasts as background tasks that feed the outbox at `rate` msg/s.
+
+    At most `window` messages of a job are queued at once, so regular
+    notifications keep flowing alongside it. The recipients are written to
+    <directory>/<job_id>.recipients.json when the job starts; progress (cursor
+    and counters) is checkpointed to <directory>/<job_id>.json every
+    `checkpoint_every` settled recipients, on the storage executor. Unfinished
+    jobs pick up from their checkpoint on resume(). Delivery is at-least-once:
+    messages in flight during a crash are sent again.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        directory: Path,
+        rate: float = 20.0,
+        window: int = 20,
+        checkpoint_every: int = 50,
+    ) -> None:
+        self.outbox = outbox
+        self.directory = directory
+        self.rate = rate
+        self.window = window
+        self.checkpoint_every = checkpoint_every
+        self.jobs: dict[str, BroadcastJob] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def start(self, admin_id: int, text: str, recipients: list[int]) -> BroadcastJob:
+        job = BroadcastJob(uuid.uuid4().hex[:8], admin_id, text, recipients)
+        # Recipients first: a progress file without them can't be resumed.
+        await self._save(self._recipients_path(job.job_id), json.dumps(recipients), job)
+        await self._checkpoint(job)
+        self._launch(job)
+        return job
+
+    def resume(self, owned: Callable[[BroadcastJob], bool] | None = None) -> list[BroadcastJob]:
+        """Restarts every unfinished job found in the checkpoint directory (for which owned(job) holds)."""
+        resumed = []
+        for path in sorted(self.directory.glob("*.json")):
+            if path.name.endswith(".recipients.json"):
+                continue
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                recipients = data.get("recipients")  # checkpoints from before the split
+                if recipients is None:
+                    recipients = json.loads(self._recipients_path(data["job_id"]).read_text(encoding="utf-8"))
+                job = BroadcastJob.from_dict(data, recipients)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("Skipping broken broadcast checkpoint %s: %r", path, e)
+                continue
+            if owned is not None and not owned(job):
+                continue
+            if job.done or job.job_id in self._tasks:
+                self.jobs.setdefault(job.job_id, job)
+                continue
+            logger.info("Resuming broadcast %s at %d/%d", job.job_id, job.cursor, len(job.recipients))
+            self._launch(job)
+            resumed.append(job)
+        return resumed
+
+    def running(self) -> list[BroadcastJob]:
+        return [self.jobs[job_id] for job_id in self._tasks]
+
+    async def close(self) -> None:
+        """Stops running jobs, leaving checkpoints to resume from."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _launch(self, job: BroadcastJob) -> None:
+        self.jobs[job.job_id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda t: self._job_done(job, t))
+
+    def _job_done(self, job: BroadcastJob, task: asyncio.Task) -> None:
+        self._tasks.pop(job.job_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Broadcast %s crashed at %d: %r", job.job_id, job.cursor, task.exception())
+
+    async def _run(self, job: BroadcastJob) -> None:
+        bucket = TokenBucket(self.rate, 1)
+        inflight: deque[asyncio.Future] = deque()
+        settled_since_checkpoint = 0
+        resumed_at = time.monotonic() - job.elapsed
+        next_index = job.cursor
+
+        def settle(result: object) -> None:
+            nonlocal settled_since_checkpoint
+            if result is None:
+                job.failed += 1
+            else:
+                job.sent += 1
+            job.cursor += 1
+            job.elapsed = time.monotonic() - resumed_at
+            settled_since_checkpoint += 1
+
+        try:
+            while next_index < len(job.recipients) or inflight:
+                # Settle strictly in order so `cursor` stays a safe resume point.
+                if inflight and (len(inflight) >= self.window or next_index >= len(job.recipients)):
+                    settle(await asyncio.shield(inflight.popleft()))
+                elif next_index < len(job.recipients):
+                    await bucket.acquire()
+                    inflight.append(self.outbox.send_message(job.recipients[next_index], job.text))
+                    next_index += 1
+                while inflight and inflight[0].done():
+                    settle(inflight.popleft().result())
+                if settled_since_checkpoint >= self.checkpoint_every:
+                    await self._checkpoint(job)
+                    settled_since_checkpoint = 0
+            job.done = True
+        finally:
+            await self._checkpoint(job)
+        logger.info(
+            "Broadcast %s finished: %d sent, %d failed, %.1f msg/s", job.job_id, job.sent, job.failed, job.rate
+        )
+        self.outbox.send_message(job.admin_id, format_report(job))
+
+    def _recipients_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.recipients.json"
+
+    async def _checkpoint(self, job: BroadcastJob) -> None:
+        await self._save(self.directory / f"{job.job_id}.json", json.dumps(job.to_dict(), ensure_ascii=False), job)
+
+    async def _save(self, path: Path, payload: str, job: BroadcastJob) -> None:
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, write_atomic, path, payload)
+        except OSError as e:
+            logger.error("Failed to checkpoint broadcast %s: %r", job.job_id, e)
+
+
+def format_report(job: BroadcastJob) -> str:
+    total = len(job.recipients)
+    status = "завершена" if job.done else f"идёт: {job.cursor}/{total}"
+    return (
+        f"<b>Рассылка {job.job_id}</b> ({status})\n\n"
+        f"Получателей: {total}\n"
+        f"Доставлено: {job.sent}\n"
+        f"Ошибок: {job.failed}\n"
+        f"Время: {job.elapsed:.0f} с, {job.rate:.1f} сообщ./с"
+    )
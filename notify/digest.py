@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class Digest:
+    """Collects items per key and hands them over in one batch per `window` seconds.
+
+    The first add() for a key starts its window; everything added for that
+    key until the window closes goes to a single flush(key, items) call.
+
+    Windows live in process memory. With BOT_WORKERS > 1 items are added on
+    the worker of whoever triggered them (for requests: the solo), so one key
+    can have an open window on several workers and get up to BOT_WORKERS
+    batches per window; batching only happens within a worker.
+    """
+
+    def __init__(self, window: float, flush: Callable[[Hashable, list], Awaitable[None]]) -> None:
+        self.window = window
+        self._flush = flush
+        self._items: dict[Hashable, list] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, key: Hashable, item: Any) -> None:
+        items = self._items.setdefault(key, [])
+        items.append(item)
+        if key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._fire, key)
+
+    def _fire(self, key: Hashable) -> None:
+        del self._timers[key]
+        task = asyncio.create_task(self._run(key, self._items.pop(key)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, items: list) -> None:
+        try:
+            await self._flush(key, items)
+        except Exception:
+            logger.exception("Digest flush for %s failed", key)
+
+    async def close(self) -> None:
+        """Flushes every open window right away. Call before shutdown."""
+        for key, timer in list(self._timers.items()):
+            timer.cancel()
+            self._fire(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
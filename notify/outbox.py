@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import SendMessage, TelegramMethod
+
+from .buckets import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ("method", "future", "attempts")
+
+    def __init__(self, method: TelegramMethod, future: asyncio.Future) -> None:
+        self.method = method
+        self.future = future
+        self.attempts = 0
+
+
+class Outbox:
+    """Rate-limited outbound queue for Bot API calls.
+
+    Handlers enqueue and return immediately; `workers` tasks deliver in the
+    background. Each chat has its own token bucket (Telegram allows about one
+    message per second per chat) and all chats share a global one. Messages to
+    one chat keep their order. TelegramRetryAfter pauses only the affected
+    chat, network/server errors are retried a few times with backoff, and
+    anything else (bot blocked, bad request) is logged and dropped.
+
+    enqueue() returns a future with the API result, or None if the call was
+    dropped; most callers just ignore it.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = 4,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_pending: int = 10000,
+        max_attempts: int = 3,
+    ) -> None:
+        self.bot = bot
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets: dict[int | str, TokenBucket] = {}
+        self._pending: dict[int | str, deque[_Job]] = {}
+        self._size = 0
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def join(self) -> None:
+        """Waits until every queued call has been delivered or dropped."""
+        await self._idle.wait()
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Drains the queue (up to `timeout` seconds) and stops the workers."""
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox closed with %d undelivered message(s)", self._size)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def send_message(self, chat_id: int | str, text: str, **kwargs: Any) -> asyncio.Future:
+        return self.enqueue(SendMessage(chat_id=chat_id, text=text, **kwargs))
+
+    def enqueue(self, method: TelegramMethod) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        if self._size >= self.max_pending:
+            logger.warning("Outbox full, dropping %s to %s", type(method).__name__, method.chat_id)
+            future.set_result(None)
+            return future
+        chat_id = method.chat_id
+        queue = self._pending.get(chat_id)
+        self._size += 1
+        self._idle.clear()
+        if queue is None:
+            self._pending[chat_id] = deque([_Job(method, future)])
+            self._schedule(chat_id)
+        else:
+            queue.append(_Job(method, future))
+        return future
+
+    def _bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) > 4 * self.max_pending:
+                self._buckets = {k: b for k, b in self._buckets.items() if k in self._pending or not b.full()}
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _schedule(self, chat_id: int | str, not_before: float = 0.0) -> None:
+        # A chat with pending jobs is always in exactly one place: waiting on
+        # this timer, in the ready queue, or held by a worker.
+        wait = max(not_before, self._bucket(chat_id).delay())
+        if wait > 0:
+            asyncio.get_running_loop().call_later(wait, self._ready.put_nowait, chat_id)
+        else:
+            self._ready.put_nowait(chat_id)
+
+    async def _work(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._pending[chat_id]
+            job = queue[0]
+            await self._global.acquire()
+            self._bucket(chat_id).take()
+            retry_in = await self._deliver(job)
+            if retry_in is None:
+                queue.popleft()
+                self._size -= 1
+            if queue:
+                self._schedule(chat_id, retry_in or 0.0)
+            else:
+                del self._pending[chat_id]
+                if not self._pending:
+                    self._idle.set()
+
+    async def _deliver(self, job: _Job) -> float | None:
+        """Makes one attempt. Returns seconds to wait before retrying, or None when done."""
+        chat_id = job.method.chat_id
+        try:
+            result = await self.bot(job.method)
+        except TelegramRetryAfter as e:
+            logger.warning("Flood control for chat %s, retrying in %ss", chat_id, e.retry_after)
+            return float(e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            job.attempts += 1
+            if job.attempts < self.max_attempts:
+                return float(2 ** job.attempts)
+            logger.error("Giving up on message to %s after %d attempts: %s", chat_id, job.attempts, e)
+            result = None
+        except TelegramAPIError as e:
+            logger.warning("Dropping message to %s: %s", chat_id, e)
+            result = None
+        except Exception:
+            logger.exception("Unexpected error sending to %s", chat_id)
+            result = None
+        if not job.future.done():
+            job.future.set_result(result)
+        return None
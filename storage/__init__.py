@@ -1,27 +1,63 @@
-from .json_storage import (
-    create_invite,
-    create_request,
-    delete_team,
-    get_active_teams,
-    get_active_users,
-    get_active_users_by_specialty,
-    get_invite,
-    get_pending_invites_for_solo,
-    get_pending_requests,
-    get_request,
-    get_requests,
-    get_request_by_solo_and_team,
-    get_team,
-    get_teams,
-    get_user,
-    get_users,
-    save_team,
-    save_user,
-    set_user_active,
-    toggle_team_pause,
-    update_invite_status,
-    update_request_status,
-)
+from config import STORAGE_BACKEND
+
+if STORAGE_BACKEND == "sqlite":
+    from .sqlite_storage import (
+        create_invite,
+        create_request,
+        delete_team,
+        find_active_users,
+        flush_writes,
+        get_active_teams,
+        get_active_users,
+        get_active_users_by_specialty,
+        get_invite,
+        get_pending_invites_for_solo,
+        get_pending_requests,
+        get_request,
+        get_requests,
+        get_request_by_solo_and_team,
+        get_stats,
+        get_team,
+        get_teams,
+        get_user,
+        get_users,
+        save_team,
+        save_user,
+        set_user_active,
+        start_writer,
+        toggle_team_pause,
+        update_invite_status,
+        update_request_status,
+    )
+else:
+    from .json_storage import (
+        create_invite,
+        create_request,
+        delete_team,
+        find_active_users,
+        flush_writes,
+        get_active_teams,
+        get_active_users,
+        get_active_users_by_specialty,
+        get_invite,
+        get_pending_invites_for_solo,
+        get_pending_requests,
+        get_request,
+        get_requests,
+        get_request_by_solo_and_team,
+        get_stats,
+        get_team,
+        get_teams,
+        get_user,
+        get_users,
+        save_team,
+        save_user,
+        set_user_active,
+        start_writer,
+        toggle_team_pause,
+        update_invite_status,
+        update_request_status,
+    )
 
 __all__ = [
     "get_users",
@@ -30,6 +66,7 @@ __all__ = [
     "set_user_active",
     "get_active_users",
     "get_active_users_by_specialty",
+    "find_active_users",
     "get_teams",
     "get_team",
     "get_active_teams",
@@ -46,4 +83,7 @@ __all__ = [
     "get_invite",
     "get_pending_invites_for_solo",
     "update_invite_status",
+    "get_stats",
+    "start_writer",
+    "flush_writes",
 ]
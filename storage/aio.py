@@ -0,0 +1,75 @@
+"""Async variants of the storage functions for use in handlers.
+
+Each call runs the sync function of the same name on the storage executor,
+so handlers never block the event loop on disk I/O. Scripts and one-off
+tools keep using the sync functions from `storage`.
+"""
+import asyncio
+import functools
+from typing import Awaitable, Callable, ParamSpec, TypeVar
+
+from . import (
+    create_invite as _create_invite,
+    create_request as _create_request,
+    delete_team as _delete_team,
+    find_active_users as _find_active_users,
+    get_active_teams as _get_active_teams,
+    get_active_users as _get_active_users,
+    get_active_users_by_specialty as _get_active_users_by_specialty,
+    get_invite as _get_invite,
+    get_pending_invites_for_solo as _get_pending_invites_for_solo,
+    get_pending_requests as _get_pending_requests,
+    get_request as _get_request,
+    get_request_by_solo_and_team as _get_request_by_solo_and_team,
+    get_requests as _get_requests,
+    get_stats as _get_stats,
+    get_team as _get_team,
+    get_teams as _get_teams,
+    get_user as _get_user,
+    get_users as _get_users,
+    save_team as _save_team,
+    save_user as _save_user,
+    set_user_active as _set_user_active,
+    toggle_team_pause as _toggle_team_pause,
+    update_invite_status as _update_invite_status,
+    update_request_status as _update_request_status,
+)
+from .executor import executor
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def _offload(fn: Callable[P, R]) -> Callable[P, Awaitable[R]]:
+    @functools.wraps(fn)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+    return wrapper
+
+
+get_users = _offload(_get_users)
+get_user = _offload(_get_user)
+save_user = _offload(_save_user)
+set_user_active = _offload(_set_user_active)
+get_active_users = _offload(_get_active_users)
+get_active_users_by_specialty = _offload(_get_active_users_by_specialty)
+find_active_users = _offload(_find_active_users)
+get_teams = _offload(_get_teams)
+get_team = _offload(_get_team)
+get_active_teams = _offload(_get_active_teams)
+save_team = _offload(_save_team)
+delete_team = _offload(_delete_team)
+toggle_team_pause = _offload(_toggle_team_pause)
+create_request = _offload(_create_request)
+get_request = _offload(_get_request)
+get_requests = _offload(_get_requests)
+get_pending_requests = _offload(_get_pending_requests)
+get_request_by_solo_and_team = _offload(_get_request_by_solo_and_team)
+update_request_status = _offload(_update_request_status)
+create_invite = _offload(_create_invite)
+get_invite = _offload(_get_invite)
+get_pending_invites_for_solo = _offload(_get_pending_invites_for_solo)
+update_invite_status = _offload(_update_invite_status)
+get_stats = _offload(_get_stats)
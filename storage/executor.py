@@ -0,0 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from config import STORAGE_WORKERS
+
+# All blocking storage work (async API calls, background writes, journal
+# compaction) runs here. Backends do their own locking, so several workers
+# can serve independent files or database connections concurrently.
+executor = ThreadPoolExecutor(max_workers=STORAGE_WORKERS, thread_name_prefix="storage")
@@ -0,0 +1,196 @@
+"""Persistent FSM storage so questionnaires in progress survive restarts."""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import FSM_FLUSH_INTERVAL, FSM_SQLITE_FILE, FSM_STORAGE, FSM_TTL, REDIS_URL
+
+from .executor import executor
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fsm_updated_at ON fsm (updated_at);
+"""
+
+
+class _Record:
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state: str | None = None, data: dict | None = None, updated_at: float = 0.0) -> None:
+        self.state = state
+        self.data = data or {}
+        self.updated_at = updated_at
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+class SQLiteFSMStorage(BaseStorage):
+    """aiogram FSM storage backed by SQLite.
+
+    Records are cached in memory once loaded. Changes are written in batches
+    every `flush_interval` seconds on the storage executor; with an interval
+    of 0 every change is written before the call returns. Forms untouched
+    for `ttl` seconds count as abandoned: they read back as empty and are
+    purged from the database on the next flush.
+    """
+
+    def __init__(self, path: Path, ttl: float = 0, flush_interval: float = 1.0) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._local = threading.local()
+        self._records: dict[str, _Record] = {}
+        self._dirty: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+
+    # --- aiogram API ---
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get(key)
+        record.state = state.state if isinstance(state, State) else state
+        await self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._get(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = await self._get(key)
+        record.data = dict(data)
+        await self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return (await self._get(key)).data.copy()
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    # --- internals ---
+    def _expired(self, record: _Record, now: float) -> bool:
+        return bool(self.ttl) and not record.empty and record.updated_at < now - self.ttl
+
+    async def _get(self, key: StorageKey) -> _Record:
+        skey = self._key_builder.build(key)
+        record = self._records.get(skey)
+        if record is None:
+            loop = asyncio.get_running_loop()
+            record = await loop.run_in_executor(executor, self._load, skey)
+            record = self._records.setdefault(skey, record)
+        if self._expired(record, time.time()):
+            record.state, record.data = None, {}
+            self._dirty.add(skey)
+        return record
+
+    async def _touch(self, key: StorageKey, record: _Record) -> None:
+        skey = self._key_builder.build(key)
+        record.updated_at = time.time()
+        self._records[skey] = record
+        self._dirty.add(skey)
+        if self.flush_interval <= 0:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception:
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Writes all pending changes in one transaction and purges expired forms."""
+        dirty, self._dirty = self._dirty, set()
+        batch = []
+        for skey in dirty:
+            record = self._records[skey]
+            batch.append((skey, record.state, json.dumps(record.data, ensure_ascii=False), record.updated_at, record.empty))
+        cutoff = time.time() - self.ttl if self.ttl else None
+        if not batch and cutoff is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(executor, self._write, batch, cutoff)
+        except Exception:
+            logger.exception("FSM flush failed, will retry")
+            self._dirty |= dirty
+            raise
+        # Drop finished and abandoned forms from memory only once the database
+        # agrees, so a concurrent cache miss can't load a stale row.
+        now = time.time()
+        for skey in [k for k, r in self._records.items() if k not in self._dirty and (r.empty or self._expired(r, now))]:
+            del self._records[skey]
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _load(self, skey: str) -> _Record:
+        row = self._conn().execute("SELECT state, data, updated_at FROM fsm WHERE key = ?", (skey,)).fetchone()
+        if row is None:
+            return _Record()
+        return _Record(row[0], json.loads(row[1]), row[2])
+
+    def _write(self, batch: list[tuple], cutoff: float | None) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for skey, state, data, updated_at, empty in batch:
+                if empty:
+                    conn.execute("DELETE FROM fsm WHERE key = ?", (skey,))
+                else:
+                    conn.execute(
+                        "INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET state = excluded.state, "
+                        "data = excluded.data, updated_at = excluded.updated_at",
+                        (skey, state, data, updated_at),
+                    )
+            if cutoff is not None:
+                conn.execute("DELETE FROM fsm WHERE updated_at < ?", (cutoff,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Builds the FSM storage selected by config.FSM_STORAGE."""
+    if FSM_STORAGE == "sqlite":
+        return SQLiteFSMStorage(FSM_SQLITE_FILE, ttl=FSM_TTL, flush_interval=FSM_FLUSH_INTERVAL)
+    if FSM_STORAGE == "redis":
+        # Works with Redis or any wire-compatible server (KeyDB, Dragonfly, ...).
+        # Needs the optional `redis` package.
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        ttl = int(FSM_TTL) or None
+        return RedisStorage.from_url(REDIS_URL, state_ttl=ttl, data_ttl=ttl)
+    return MemoryStorage()
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+
+from metrics import storage_journal_appends_total
+
+from .writer import PersistenceWriter, dumps, write_atomic
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """Append-only event log on top of a JSON snapshot.
+
+    The snapshot (e.g. requests.json) keeps its old format. Every mutation is
+    one JSON line appended to <name>.log.jsonl:
+
+        {"op": "put", "id": ..., "record": {...}}
+        {"op": "set", "id": ..., "fields": {"status": "accepted"}}
+
+    Both ops are idempotent, so replaying a line twice is harmless. That keeps
+    compaction simple: once the log passes `compact_bytes`, it is renamed to
+    .compacting, the current state is dumped and written as the new snapshot
+    in the background, and the .compacting file is deleted. A crash at any
+    point leaves snapshot + .compacting + log, which replays to the same state.
+    `lock` is the owner's lock for the file; the background snapshot write
+    holds it so load() never sees the new snapshot with the old mtime.
+    """
+
+    def __init__(
+        self,
+        snapshot: Path,
+        writer: PersistenceWriter,
+        compact_bytes: int,
+        lock: AbstractContextManager | None = None,
+    ) -> None:
+        self.snapshot = snapshot
+        self.log = snapshot.with_name(snapshot.stem + ".log.jsonl")
+        self.compacting = self.log.with_name(self.log.name + ".compacting")
+        self.compact_bytes = compact_bytes
+        self._writer = writer
+        self._lock = lock or nullcontext()
+        self.records: dict[str, dict] | None = None
+        self._snapshot_mtime: int | None = None
+        self._offset = 0
+        self._compaction_running = False
+
+    def load(self) -> dict[str, dict]:
+        """Returns the current records, picking up changes made by other processes."""
+        if self.records is None or self._stat(self.snapshot) != self._snapshot_mtime:
+            self._reload()
+            return self.records
+        size = self._size(self.log)
+        if size < self._offset:
+            self._reload()
+        elif size > self._offset:
+            # Someone else appended: copy so derived indexes notice the change.
+            self.records = dict(self.records)
+            self._offset = self._replay(self.log, self.records, self._offset)
+        return self.records
+
+    def put(self, record_id: str, record: dict) -> None:
+        self.load()[record_id] = record
+        self._append({"op": "put", "id": record_id, "record": record})
+
+    def set(self, record_id: str, **fields) -> None:
+        self.load()[record_id].update(fields)
+        self._append({"op": "set", "id": record_id, "fields": fields})
+
+    def _reload(self) -> None:
+        self._snapshot_mtime = self._stat(self.snapshot)
+        records = json.loads(self.snapshot.read_text(encoding="utf-8")) if self._snapshot_mtime else {}
+        if self.compacting.exists():
+            self._replay(self.compacting, records, 0)
+        self._offset = self._replay(self.log, records, 0)
+        self.records = records
+
+    @staticmethod
+    def _replay(path: Path, records: dict[str, dict], offset: int) -> int:
+        """Applies events from path starting at byte offset. Returns the new offset."""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn write at the tail (crash mid-append): stop before it.
+                    break
+                offset += len(line)
+                event = json.loads(line)
+                if event["op"] == "put":
+                    records[event["id"]] = event["record"]
+                elif event["op"] == "set" and event["id"] in records:
+                    records[event["id"]].update(event["fields"])
+        return offset
+
+    def _append(self, event: dict) -> None:
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        self.log.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log, "ab") as f:
+            f.write(line)
+            end = f.tell()
+        storage_journal_appends_total.inc(file=self.log.name)
+        # If another process appended in between, leave the offset alone and
+        # let the next load() replay from there (our own line included).
+        if end == self._offset + len(line):
+            self._offset = end
+        if end >= self.compact_bytes:
+            self._compact()
+
+    def _compact(self) -> None:
+        if self._compaction_running:
+            return
+        payload = dumps(self.records)
+        # A leftover .compacting file (crash or failed write) is already covered
+        # by payload; the log then stays put and is rotated next time.
+        if not self.compacting.exists():
+            os.replace(self.log, self.compacting)
+            self._offset = 0
+        self._compaction_running = True
+        self._writer.run(self._write_snapshot, payload)
+
+    def _write_snapshot(self, payload: str) -> None:
+        try:
+            with self._lock:
+                write_atomic(self.snapshot, payload)
+                self._snapshot_mtime = self._stat(self.snapshot)
+                self.compacting.unlink(missing_ok=True)
+            logger.info("Compacted %s", self.snapshot.name)
+        finally:
+            self._compaction_running = False
+
+    @staticmethod
+    def _stat(path: Path) -> int | None:
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
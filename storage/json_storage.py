@@ -1,10 +1,30 @@
+import functools
+import heapq
 import json
-import tempfile
+from bisect import bisect_left, insort
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Callable, TypeVar
 
-from config import INVITES_FILE, REQUESTS_FILE, TEAMS_FILE, USERS_FILE
+from config import (
+    INVITES_FILE,
+    JOURNAL_COMPACT_BYTES,
+    REQUESTS_FILE,
+    SEQUENCES_FILE,
+    STORAGE_WRITE_DELAY,
+    TEAMS_FILE,
+    USERS_FILE,
+)
+
+from metrics import storage_cache_hits_total, storage_read_bytes, storage_read_seconds
+
+from .executor import executor
+from .journal import Journal
+from .sequences import Sequences
+from .snapshots import Snapshots
+from .stats import Tally, build_stats, link_keys, team_keys, user_keys
+from .writer import PersistenceWriter
 
 
 def _ensure_file(path: Path, default: dict | list) -> None:
@@ -13,33 +33,222 @@ def _ensure_file(path: Path, default: dict | list) -> None:
         path.write_text(json.dumps(default, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+# Process-wide cache: path -> (mtime_ns, parsed data). Reads are served from
+# memory until the file is changed on disk by someone else; writes go through
+# to disk and refresh the entry. Returned dicts are shared, so callers must
+# only mutate them under the file's lock right before passing them back to
+# _write().
+_cache: dict[Path, tuple[int, dict]] = {}
+# Bumped whenever a file's cached contents change, from here or from disk.
+_versions: dict[Path, int] = {}
+_snapshots = Snapshots()
+
+
+def _bump(path: Path) -> None:
+    _versions[path] = _versions.get(path, 0) + 1
+
+
+def _mtime(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# Records of these files carry a "version" that cached cards are keyed on (see handlers.cards).
+_PROFILE_FILES = (USERS_FILE, TEAMS_FILE)
+
+
+def _stamp_versions(data: dict, previous: dict | None) -> None:
+    """Gives a new version to loaded records that have none or were edited on disk.
+
+    save_user/save_team stamp every record they write, but older data has no
+    version and a hand edit keeps the old one, so their cards would stay cached.
+    """
+    stale = [
+        record for key, record in data.items()
+        if "version" not in record or (
+            previous is not None
+            and (old := previous.get(key)) is not None
+            and old.get("version") == record["version"]
+            and old != record
+        )
+    ]
+    for record in stale:
+        record["version"] = _sequences.next("profile_version", block=max(len(stale), 32))
+
+
 def _read(path: Path) -> dict:
+    journal = _journals.get(path)
+    if journal is not None:
+        return journal.load()
+    cached = _cache.get(path)
+    if cached is not None and (_writer.pending(path) or cached[0] == _mtime(path)):
+        storage_cache_hits_total.inc(file=path.name)
+        return cached[1]
     _ensure_file(path, {})
-    return json.loads(path.read_text(encoding="utf-8"))
+    with storage_read_seconds.time(file=path.name):
+        raw = path.read_bytes()
+        data = json.loads(raw)
+    storage_read_bytes.observe(len(raw), file=path.name)
+    if path in _PROFILE_FILES:
+        _stamp_versions(data, cached[1] if cached is not None else None)
+    _cache[path] = (_mtime(path), data)
+    _bump(path)
+    return data
+
+
+# One re-entrant lock per file: storage functions run on several executor
+# threads, and everything touching a file's shared dict (reads that iterate
+# it, read-modify-write cycles, background serialization) holds its lock.
+# Different files never block each other.
+_locks: dict[Path, threading.RLock] = {
+    path: threading.RLock() for path in (USERS_FILE, TEAMS_FILE, REQUESTS_FILE, INVITES_FILE)
+}
+
+F = TypeVar("F", bound=Callable)
+
+
+def _locked(path: Path) -> Callable[[F], F]:
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _locks[path]:
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _on_written(path: Path) -> None:
+    with _locks[path]:
+        cached = _cache.get(path)
+        if cached is not None:
+            _cache[path] = (_mtime(path), cached[1])
+
+
+_writer = PersistenceWriter(STORAGE_WRITE_DELAY, executor, on_written=_on_written, lock_for=_locks.__getitem__)
+_sequences = Sequences(SEQUENCES_FILE)
+
+# Requests and invites only ever grow and mostly change status, so they are
+# journaled instead of rewritten: each mutation appends one line.
+_journals: dict[Path, Journal] = {
+    REQUESTS_FILE: Journal(REQUESTS_FILE, _writer, JOURNAL_COMPACT_BYTES, _locks[REQUESTS_FILE]),
+    INVITES_FILE: Journal(INVITES_FILE, _writer, JOURNAL_COMPACT_BYTES, _locks[INVITES_FILE]),
+}
 
 
 def _write(path: Path, data: dict) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".json")
+    _cache[path] = (_cache[path][0] if path in _cache else None, data)
+    _bump(path)
     try:
-        with open(fd, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        Path(tmp).replace(path)
+        _writer.write(path, data)
     except Exception:
-        Path(tmp).unlink(missing_ok=True)
+        _cache.pop(path, None)
         raise
 
 
+def start_writer() -> None:
+    """Switches writes to the debounced background writer. Call from the running event loop.
+
+    From then on the bot must go through storage.aio so that every access runs
+    on the storage executor, serialized with the background writes.
+    """
+    _writer.start()
+
+
+async def flush_writes() -> None:
+    """Waits until every acknowledged mutation is on disk."""
+    await _writer.flush()
+
+
+# --- User index ---
+def _user_bucket(user: dict) -> tuple[str, str, str]:
+    return (
+        user.get("specialty", "other"),
+        user.get("participation_format", "online"),
+        user.get("age_category", "18+"),
+    )
+
+
+class _UserIndex:
+    """Inverted index of active users by (specialty, participation_format, age_category).
+
+    Each user gets an ordinal that follows users.json order, and every bucket
+    is a sorted list of ordinals, so results keep the file's browse order.
+    save_user and set_user_active update it in place instead of rescanning.
+    It also carries the users' /stats counters.
+    """
+
+    def __init__(self, users: dict[str, dict]) -> None:
+        self.users = users
+        self.tally = Tally(user_keys)
+        self.keys: list[str] = []
+        self.ordinals: dict[str, int] = {}
+        self.buckets: dict[tuple[str, str, str], list[int]] = {}
+        self.bucket_of: dict[str, tuple[str, str, str]] = {}
+        for key, user in users.items():
+            self.add(key, user)
+
+    def add(self, key: str, user: dict) -> None:
+        if key not in self.ordinals:
+            self.ordinals[key] = len(self.keys)
+            self.keys.append(key)
+        self.tally.put(key, user)
+        if not user.get("is_active", True):
+            return
+        bucket = _user_bucket(user)
+        insort(self.buckets.setdefault(bucket, []), self.ordinals[key])
+        self.bucket_of[key] = bucket
+
+    def discard(self, key: str) -> None:
+        bucket = self.bucket_of.pop(key, None)
+        if bucket is None:
+            return
+        ordinals = self.buckets[bucket]
+        del ordinals[bisect_left(ordinals, self.ordinals[key])]
+
+    def find(
+        self,
+        specialties: list[str] | None = None,
+        participation_format: str | None = None,
+        age_category: str | None = None,
+    ) -> list[tuple[str, dict]]:
+        lists = [
+            ordinals for (spec, fmt, age), ordinals in self.buckets.items()
+            if (specialties is None or spec in specialties)
+            and (participation_format is None or fmt == participation_format)
+            and (age_category is None or age == age_category)
+        ]
+        keys = self.keys
+        return [(keys[o], self.users[keys[o]]) for o in heapq.merge(*lists)]
+
+
+_user_indexes: dict[Path, _UserIndex] = {}
+
+
+def _user_index() -> _UserIndex:
+    users = _read(USERS_FILE)
+    index = _user_indexes.get(USERS_FILE)
+    if index is None or index.users is not users:
+        index = _user_indexes[USERS_FILE] = _UserIndex(users)
+    return index
+
+
 # --- Users ---
+@_locked(USERS_FILE)
 def get_users() -> dict[str, dict]:
     return _read(USERS_FILE)
 
 
+@_locked(USERS_FILE)
 def get_user(user_id: int) -> dict | None:
     users = get_users()
     return users.get(str(user_id))
 
 
+@_locked(USERS_FILE)
 def save_user(
     user_id: int,
     username: str | None,
@@ -50,8 +259,10 @@ def save_user(
     description: str,
     is_active: bool = True,
 ) -> None:
-    users = get_users()
+    index = _user_index()
+    users = index.users
     existing = users.get(str(user_id), {})
+    index.discard(str(user_id))
     users[str(user_id)] = {
         "user_id": user_id,
         "username": username or "",
@@ -62,54 +273,107 @@ def save_user(
         "description": description,
         "is_active": existing.get("is_active", True) if existing else True,
         "created_at": existing.get("created_at", datetime.utcnow().isoformat()),
+        "version": _sequences.next("profile_version"),
     }
+    index.add(str(user_id), users[str(user_id)])
     _write(USERS_FILE, users)
 
 
+@_locked(USERS_FILE)
 def set_user_active(user_id: int, is_active: bool) -> bool:
-    users = get_users()
+    index = _user_index()
+    users = index.users
     key = str(user_id)
     if key not in users:
         return False
+    index.discard(key)
     users[key]["is_active"] = is_active
+    index.add(key, users[key])
     _write(USERS_FILE, users)
     return True
 
 
+@_locked(USERS_FILE)
 def get_active_users() -> list[tuple[str, dict]]:
-    users = get_users()
-    return [(k, v) for k, v in users.items() if v.get("is_active", True)]
+    return find_active_users()
 
 
+@_locked(USERS_FILE)
 def get_active_users_by_specialty(specialty: str | None) -> list[tuple[str, dict]]:
-    active = get_active_users()
+    """Active users in browse order. The list is a shared snapshot; don't mutate it."""
     if not specialty or specialty == "all":
-        return active
-    return [(k, v) for k, v in active if v.get("specialty", "other") == specialty]
+        return find_active_users()
+    return find_active_users([specialty])
+
+
+@_locked(USERS_FILE)
+def find_active_users(
+    specialties: list[str] | None = None,
+    participation_format: str | None = None,
+    age_category: str | None = None,
+) -> list[tuple[str, dict]]:
+    """Active users matching all given filters (None = any), in browse order.
+
+    Served from the inverted index and cached until users change; the list
+    is shared, don't mutate it.
+    """
+    index = _user_index()
+    spec_key = tuple(sorted(specialties)) if specialties is not None else None
+    return _snapshots.get(
+        ("users", spec_key, participation_format, age_category),
+        _versions[USERS_FILE],
+        lambda: index.find(specialties, participation_format, age_category),
+    )
 
 
 # --- Teams ---
+@_locked(TEAMS_FILE)
 def get_teams() -> dict[str, dict]:
     return _read(TEAMS_FILE)
 
 
+@_locked(TEAMS_FILE)
 def get_team(owner_id: int) -> dict | None:
     teams = get_teams()
     return teams.get(f"owner_{owner_id}")
 
 
+@_locked(TEAMS_FILE)
 def get_active_teams() -> list[tuple[str, dict]]:
-    """Returns list of (team_key, team) for teams where is_paused is False."""
+    """Returns list of (team_key, team) for teams where is_paused is False.
+
+    The list is a shared snapshot, rebuilt only after teams change; don't mutate it.
+    """
     teams = get_teams()
-    return [(k, v) for k, v in teams.items() if not v.get("is_paused", False)]
+    return _snapshots.get(
+        ("teams", None),
+        _versions[TEAMS_FILE],
+        lambda: [(k, v) for k, v in teams.items() if not v.get("is_paused", False)],
+    )
 
 
-def _next_team_number() -> int:
-    teams = get_teams()
-    numbers = [t.get("team_number") for t in teams.values() if isinstance(t.get("team_number"), int)]
-    return max(numbers, default=0) + 1
+_team_tallies: dict[Path, tuple[dict, Tally]] = {}
 
 
+def _team_tally() -> Tally:
+    """/stats counters for the currently cached teams, rebuilt after a reload."""
+    teams = _read(TEAMS_FILE)
+    cached = _team_tallies.get(TEAMS_FILE)
+    if cached is None or cached[0] is not teams:
+        tally = Tally(team_keys)
+        for key, team in teams.items():
+            tally.put(key, team)
+        cached = _team_tallies[TEAMS_FILE] = (teams, tally)
+    return cached[1]
+
+
+def _max_team_number() -> int:
+    # Only consulted once, to seed the sequence for data created before it existed.
+    numbers = [t.get("team_number") for t in get_teams().values() if isinstance(t.get("team_number"), int)]
+    return max(numbers, default=0)
+
+
+@_locked(TEAMS_FILE)
 def save_team(
     owner_id: int,
     owner_username: str | None,
@@ -123,7 +387,7 @@ def save_team(
     existing = teams.get(key, {})
     team_number = existing.get("team_number")
     if team_number is None:
-        team_number = _next_team_number()
+        team_number = _sequences.next("team_number", _max_team_number, block=1)
     teams[key] = {
         "owner_id": owner_id,
         "owner_username": owner_username or "",
@@ -135,20 +399,25 @@ def save_team(
         "is_paused": existing.get("is_paused", False),
         "members": existing.get("members", []),
         "created_at": existing.get("created_at", datetime.utcnow().isoformat()),
+        "version": _sequences.next("profile_version"),
     }
+    _team_tally().put(key, teams[key])
     _write(TEAMS_FILE, teams)
 
 
+@_locked(TEAMS_FILE)
 def delete_team(owner_id: int) -> bool:
     teams = get_teams()
     key = f"owner_{owner_id}"
     if key not in teams:
         return False
     del teams[key]
+    _team_tally().remove(key)
     _write(TEAMS_FILE, teams)
     return True
 
 
+@_locked(TEAMS_FILE)
 def toggle_team_pause(owner_id: int) -> bool:
     """Toggles is_paused for the team. Returns new is_paused value."""
     teams = get_teams()
@@ -156,93 +425,180 @@ def toggle_team_pause(owner_id: int) -> bool:
     if key not in teams:
         return False
     teams[key]["is_paused"] = not teams[key].get("is_paused", False)
+    teams[key]["version"] = _sequences.next("profile_version")
+    _team_tally().put(key, teams[key])
     _write(TEAMS_FILE, teams)
     return teams[key]["is_paused"]
 
 
+# --- Request/invite indexes ---
+class _LinkIndex:
+    """Secondary indexes over requests or invites (both link a solo and a team).
+
+    Built once per loaded file and kept in sync by the create/update functions,
+    so lookups cost O(1) or O(matches) instead of a scan over the full history.
+    """
+
+    def __init__(self, records: dict[str, dict], kind: str) -> None:
+        self.records = records
+        self.tally = Tally(link_keys(kind))
+        self.by_pair: dict[tuple[int, int], list[str]] = {}
+        self.by_owner_status: dict[tuple[int, str], dict[str, None]] = {}
+        self.by_solo_status: dict[tuple[int, str], dict[str, None]] = {}
+        for record_id, record in records.items():
+            self.add(record_id, record)
+
+    def add(self, record_id: str, record: dict) -> None:
+        status = record.get("status", "pending")
+        self.by_pair.setdefault((record["solo_id"], record["team_owner_id"]), []).append(record_id)
+        self.by_owner_status.setdefault((record["team_owner_id"], status), {})[record_id] = None
+        self.by_solo_status.setdefault((record["solo_id"], status), {})[record_id] = None
+        self.tally.put(record_id, record)
+
+    def set_status(self, record_id: str, record: dict, status: str) -> None:
+        old = record.get("status", "pending")
+        self.by_owner_status.get((record["team_owner_id"], old), {}).pop(record_id, None)
+        self.by_solo_status.get((record["solo_id"], old), {}).pop(record_id, None)
+        self.by_owner_status.setdefault((record["team_owner_id"], status), {})[record_id] = None
+        self.by_solo_status.setdefault((record["solo_id"], status), {})[record_id] = None
+        self.tally.put(record_id, {**record, "status": status})
+
+    def has_pending(self, solo_id: int, team_owner_id: int) -> bool:
+        ids = self.by_pair.get((solo_id, team_owner_id), ())
+        return any(self.records[rid].get("status", "pending") == "pending" for rid in ids)
+
+    def by_owner(self, team_owner_id: int, status: str) -> list[dict]:
+        return [self.records[rid] for rid in self.by_owner_status.get((team_owner_id, status), ())]
+
+    def by_solo(self, solo_id: int, status: str) -> list[dict]:
+        return [self.records[rid] for rid in self.by_solo_status.get((solo_id, status), ())]
+
+
+_indexes: dict[Path, _LinkIndex] = {}
+
+
+def _link_index(path: Path) -> _LinkIndex:
+    """Returns the index for the currently cached contents of path, rebuilding it after a reload."""
+    records = _read(path)
+    index = _indexes.get(path)
+    if index is None or index.records is not records:
+        index = _indexes[path] = _LinkIndex(records, path.stem)
+    return index
+
+
 # --- Requests ---
+@_locked(REQUESTS_FILE)
 def get_requests() -> dict[str, dict]:
     return _read(REQUESTS_FILE)
 
 
+@_locked(REQUESTS_FILE)
 def create_request(solo_id: int, team_owner_id: int) -> str | None:
     """Creates a pending request. Returns request_id or None if duplicate."""
-    requests = get_requests()
-    for req in requests.values():
-        if req["solo_id"] == solo_id and req["team_owner_id"] == team_owner_id and req["status"] == "pending":
-            return None
-    ts = int(datetime.utcnow().timestamp())
-    request_id = f"{solo_id}_{team_owner_id}_{ts}"
-    requests[request_id] = {
+    index = _link_index(REQUESTS_FILE)
+    if index.has_pending(solo_id, team_owner_id):
+        return None
+    request_id = f"req_{_sequences.next('request')}"
+    record = {
         "request_id": request_id,
         "solo_id": solo_id,
         "team_owner_id": team_owner_id,
         "status": "pending",
         "created_at": datetime.utcnow().isoformat(),
     }
-    _write(REQUESTS_FILE, requests)
+    index.add(request_id, record)
+    _journals[REQUESTS_FILE].put(request_id, record)
     return request_id
 
 
+@_locked(REQUESTS_FILE)
 def get_request(request_id: str) -> dict | None:
     return get_requests().get(request_id)
 
 
+@_locked(REQUESTS_FILE)
 def get_request_by_solo_and_team(solo_id: int, team_owner_id: int) -> dict | None:
-    for req in get_requests().values():
-        if req["solo_id"] == solo_id and req["team_owner_id"] == team_owner_id:
-            return req
-    return None
+    index = _link_index(REQUESTS_FILE)
+    ids = index.by_pair.get((solo_id, team_owner_id))
+    return index.records[ids[0]] if ids else None
 
 
+@_locked(REQUESTS_FILE)
 def get_pending_requests(team_owner_id: int) -> list[dict]:
-    return [r for r in get_requests().values() if r["team_owner_id"] == team_owner_id and r["status"] == "pending"]
+    return _link_index(REQUESTS_FILE).by_owner(team_owner_id, "pending")
 
 
-def update_request_status(request_id: str, status: str) -> bool:
-    requests = get_requests()
-    if request_id not in requests:
+@_locked(REQUESTS_FILE)
+def update_request_status(request_id: str, status: str, expected: str | None = None) -> bool:
+    """Sets the status. With `expected`, only if the current status is that one.
+
+    Returns False if the record is missing or was already moved on (by a
+    concurrent accept/deny, a double tap), so callers act only on True.
+    """
+    index = _link_index(REQUESTS_FILE)
+    record = index.records.get(request_id)
+    if record is None or expected is not None and record.get("status", "pending") != expected:
         return False
-    requests[request_id]["status"] = status
-    _write(REQUESTS_FILE, requests)
+    index.set_status(request_id, record, status)
+    _journals[REQUESTS_FILE].set(request_id, status=status)
     return True
 
 
 # --- Invites (team -> solo) ---
+@_locked(INVITES_FILE)
 def get_invites() -> dict[str, dict]:
     return _read(INVITES_FILE)
 
 
+@_locked(INVITES_FILE)
 def create_invite(team_owner_id: int, solo_id: int) -> str | None:
-    invites = get_invites()
-    for inv in invites.values():
-        if inv["team_owner_id"] == team_owner_id and inv["solo_id"] == solo_id and inv.get("status") == "pending":
-            return None
-    ts = int(datetime.utcnow().timestamp())
-    invite_id = f"inv_{team_owner_id}_{solo_id}_{ts}"
-    invites[invite_id] = {
+    index = _link_index(INVITES_FILE)
+    if index.has_pending(solo_id, team_owner_id):
+        return None
+    invite_id = f"inv_{_sequences.next('invite')}"
+    record = {
         "invite_id": invite_id,
         "team_owner_id": team_owner_id,
         "solo_id": solo_id,
         "status": "pending",
         "created_at": datetime.utcnow().isoformat(),
     }
-    _write(INVITES_FILE, invites)
+    index.add(invite_id, record)
+    _journals[INVITES_FILE].put(invite_id, record)
     return invite_id
 
 
+@_locked(INVITES_FILE)
 def get_invite(invite_id: str) -> dict | None:
     return get_invites().get(invite_id)
 
 
+@_locked(INVITES_FILE)
 def get_pending_invites_for_solo(solo_id: int) -> list[dict]:
-    return [i for i in get_invites().values() if i["solo_id"] == solo_id and i.get("status") == "pending"]
+    return _link_index(INVITES_FILE).by_solo(solo_id, "pending")
 
 
-def update_invite_status(invite_id: str, status: str) -> bool:
-    invites = get_invites()
-    if invite_id not in invites:
+@_locked(INVITES_FILE)
+def update_invite_status(invite_id: str, status: str, expected: str | None = None) -> bool:
+    index = _link_index(INVITES_FILE)
+    record = index.records.get(invite_id)
+    if record is None or expected is not None and record.get("status", "pending") != expected:
         return False
-    invites[invite_id]["status"] = status
-    _write(INVITES_FILE, invites)
+    index.set_status(invite_id, record, status)
+    _journals[INVITES_FILE].set(invite_id, status=status)
     return True
+
+
+# --- Stats ---
+def get_stats() -> dict:
+    """Aggregate counters for /stats, maintained on every mutation (see storage.stats)."""
+    counts: dict[str, int] = {}
+    with _locks[USERS_FILE]:
+        counts.update(_user_index().tally.counts)
+    with _locks[TEAMS_FILE]:
+        counts.update(_team_tally().counts)
+    with _locks[REQUESTS_FILE]:
+        counts.update(_link_index(REQUESTS_FILE).tally.counts)
+    with _locks[INVITES_FILE]:
+        counts.update(_link_index(INVITES_FILE).tally.counts)
+    return build_stats(counts)
@@ -0,0 +1,70 @@
+"""One-shot import of data/*.json into the SQLite backend.
+
+Usage: python -m storage.migrate
+
+Safe to re-run: records are upserted by their natural keys, so running it
+again after editing the JSON files simply refreshes the database.
+"""
+import json
+import logging
+import sys
+from pathlib import Path
+
+from config import (
+    INVITES_FILE,
+    JOURNAL_COMPACT_BYTES,
+    REQUESTS_FILE,
+    SEQUENCES_FILE,
+    SQLITE_FILE,
+    TEAMS_FILE,
+    USERS_FILE,
+)
+
+from . import sqlite_storage
+from .executor import executor
+from .journal import Journal
+from .sequences import Sequences
+from .writer import PersistenceWriter
+
+logger = logging.getLogger(__name__)
+
+
+def _load(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _load_journaled(path: Path) -> dict:
+    """Snapshot plus whatever is still only in the journal (see storage.journal)."""
+    return Journal(path, PersistenceWriter(0, executor), JOURNAL_COMPACT_BYTES).load()
+
+
+def migrate() -> dict[str, int]:
+    """Copies every JSON record into SQLite. Returns number of rows per table."""
+    users = _load(USERS_FILE)
+    teams = _load(TEAMS_FILE)
+    requests = _load_journaled(REQUESTS_FILE)
+    invites = _load_journaled(INVITES_FILE)
+    with sqlite_storage._tx() as conn:
+        # Never reissue a team number or id the JSON backend has already used.
+        numbers = [t.get("team_number") for t in teams.values() if isinstance(t.get("team_number"), int)]
+        sqlite_storage._advance(conn, "team_number", max(numbers, default=0))
+        for name, value in Sequences(SEQUENCES_FILE).load().items():
+            sqlite_storage._advance(conn, name, value)
+        # Fresh versions: the JSON may predate them or have been edited since the last run.
+        for user in users.values():
+            sqlite_storage._upsert_user(conn, {**user, "version": sqlite_storage._next_value(conn, "profile_version")})
+        for team in teams.values():
+            sqlite_storage._upsert_team(conn, {**team, "version": sqlite_storage._next_value(conn, "profile_version")})
+        for req in requests.values():
+            sqlite_storage._insert_request(conn, req)
+        for inv in invites.values():
+            sqlite_storage._insert_invite(conn, inv)
+    return {"users": len(users), "teams": len(teams), "requests": len(requests), "invites": len(invites)}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format="%(message)s")
+    counts = migrate()
+    logger.info("Migrated into %s: %s", SQLITE_FILE, ", ".join(f"{k}={v}" for k, v in counts.items()))
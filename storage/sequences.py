@@ -0,0 +1,77 @@
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+from .writer import dumps, write_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
+
+class Sequences:
+    """Persisted monotonic counters (team numbers, request and invite ids).
+
+    Values are reserved from the file in blocks of `block`: the high-water
+    mark is written before any value of the block is handed out, so ids
+    never repeat, even after a crash (the rest of the block is skipped) or
+    with several processes sharing the data directory (reservations hold an
+    flock on <name>.lock). Handing out a value from the current block is a
+    counter increment under a thread lock.
+    """
+
+    def __init__(self, path: Path, block: int = 32) -> None:
+        self.path = path
+        self.lock_path = path.with_suffix(".lock")
+        self.block = block
+        self._lock = threading.Lock()
+        self._next: dict[str, int] = {}
+        self._limit: dict[str, int] = {}
+
+    def next(self, name: str, start: Callable[[], int] | None = None, block: int | None = None) -> int:
+        """Returns the next value of `name`.
+
+        A sequence missing from the file continues after start() (e.g. the
+        largest number already in use); without `start` it begins at 1.
+        Pass block=1 for user-visible numbers that shouldn't jump after a restart.
+        """
+        with self._lock:
+            value = self._next.get(name, 0)
+            if value >= self._limit.get(name, 0):
+                value = self._reserve(name, start, block or self.block)
+            self._next[name] = value + 1
+            return value
+
+    def _reserve(self, name: str, start: Callable[[], int] | None, block: int) -> int:
+        with self._file_lock():
+            data = self.load()
+            current = data.get(name)
+            if current is None:
+                current = start() if start is not None else 0
+            data[name] = current + block
+            write_atomic(self.path, dumps(data))
+        self._limit[name] = current + block + 1
+        return current + 1
+
+    def load(self) -> dict[str, int]:
+        """High-water marks as persisted: every value handed out so far is <= its mark."""
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,28 @@
+import threading
+from typing import Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class Snapshots:
+    """Versioned cache of derived data, e.g. the ordered list of active teams.
+
+    A value is rebuilt only when the version of its source data changes, so
+    paging through browse results is an index into a ready-made list.
+    Cached values are shared between callers and must not be mutated.
+    Read the version *before* building so a concurrent change can only
+    make the entry look stale, never hide newer data.
+    """
+
+    def __init__(self) -> None:
+        self._data: dict[Hashable, tuple[int, object]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: int, build: Callable[[], T]) -> T:
+        hit = self._data.get(key)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+        value = build()
+        with self._lock:
+            self._data[key] = (version, value)
+        return value
@@ -0,0 +1,566 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+from config import SQLITE_FILE
+
+from .snapshots import Snapshots
+from .stats import build_stats, hours_back
+
+# Every table keeps the full record as JSON in `data` (so callers get exactly
+# the same dicts as from json_storage) plus the columns we filter on.
+# Rows are returned in rowid order, which matches JSON insertion order.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER NOT NULL UNIQUE,
+    specialty TEXT,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_active_specialty ON users (is_active, specialty);
+
+CREATE TABLE IF NOT EXISTS teams (
+    owner_id INTEGER NOT NULL UNIQUE,
+    team_number INTEGER,
+    is_paused INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_teams_paused ON teams (is_paused);
+CREATE INDEX IF NOT EXISTS idx_teams_number ON teams (team_number);
+
+CREATE TABLE IF NOT EXISTS requests (
+    request_id TEXT NOT NULL UNIQUE,
+    solo_id INTEGER NOT NULL,
+    team_owner_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_requests_solo_team ON requests (solo_id, team_owner_id);
+CREATE INDEX IF NOT EXISTS idx_requests_team_status ON requests (team_owner_id, status);
+
+CREATE TABLE IF NOT EXISTS invites (
+    invite_id TEXT NOT NULL UNIQUE,
+    team_owner_id INTEGER NOT NULL,
+    solo_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_invites_team_solo ON invites (team_owner_id, solo_id);
+CREATE INDEX IF NOT EXISTS idx_invites_solo_status ON invites (solo_id, status);
+
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+-- Last value handed out per sequence (team_number, request, invite, profile_version).
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO sequences (name, value) SELECT 'team_number', COALESCE(MAX(team_number), 0) FROM teams;
+"""
+
+# /stats counters (names as in storage.stats), kept up to date by triggers so
+# every writer, storage.migrate included, maintains them in the same transaction.
+# A database created before the counters existed is backfilled once.
+_STATS_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+
+CREATE TEMP VIEW IF NOT EXISTS stats_backfill AS
+    SELECT 1 AS needed WHERE NOT EXISTS (SELECT 1 FROM stats WHERE key = '_backfilled');
+INSERT OR IGNORE INTO stats (key, n) SELECT 'users', COUNT(*) FROM users, stats_backfill;
+INSERT OR IGNORE INTO stats (key, n) SELECT 'users.active', COALESCE(SUM(is_active), 0) FROM users, stats_backfill;
+INSERT OR IGNORE INTO stats (key, n)
+    SELECT 'users.specialty.' || COALESCE(specialty, 'other'), COUNT(*) FROM users, stats_backfill GROUP BY 1;
+INSERT OR IGNORE INTO stats (key, n)
+    SELECT 'users.active.specialty.' || COALESCE(specialty, 'other'), SUM(is_active) FROM users, stats_backfill GROUP BY 1;
+INSERT OR IGNORE INTO stats (key, n) SELECT 'teams', COUNT(*) FROM teams, stats_backfill;
+INSERT OR IGNORE INTO stats (key, n) SELECT 'teams.paused', COALESCE(SUM(is_paused), 0) FROM teams, stats_backfill;
+{links_backfill}
+INSERT OR IGNORE INTO stats (key, n) VALUES ('_backfilled', 1);
+DROP VIEW stats_backfill;
+
+CREATE TRIGGER IF NOT EXISTS stats_users_insert AFTER INSERT ON users BEGIN
+    INSERT INTO stats (key, n) VALUES
+        ('users', 1),
+        ('users.active', NEW.is_active),
+        ('users.specialty.' || COALESCE(NEW.specialty, 'other'), 1),
+        ('users.active.specialty.' || COALESCE(NEW.specialty, 'other'), NEW.is_active)
+    ON CONFLICT(key) DO UPDATE SET n = n + excluded.n;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_users_update AFTER UPDATE OF specialty, is_active ON users BEGIN
+    INSERT INTO stats (key, n) VALUES
+        ('users.active', NEW.is_active - OLD.is_active),
+        ('users.specialty.' || COALESCE(OLD.specialty, 'other'), -1),
+        ('users.specialty.' || COALESCE(NEW.specialty, 'other'), 1),
+        ('users.active.specialty.' || COALESCE(OLD.specialty, 'other'), -OLD.is_active),
+        ('users.active.specialty.' || COALESCE(NEW.specialty, 'other'), NEW.is_active)
+    ON CONFLICT(key) DO UPDATE SET n = n + excluded.n;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_teams_insert AFTER INSERT ON teams BEGIN
+    INSERT INTO stats (key, n) VALUES ('teams', 1), ('teams.paused', NEW.is_paused)
+    ON CONFLICT(key) DO UPDATE SET n = n + excluded.n;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_teams_update AFTER UPDATE OF is_paused ON teams BEGIN
+    INSERT INTO stats (key, n) VALUES ('teams.paused', NEW.is_paused - OLD.is_paused)
+    ON CONFLICT(key) DO UPDATE SET n = n + excluded.n;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_teams_delete AFTER DELETE ON teams BEGIN
+    INSERT INTO stats (key, n) VALUES ('teams', -1), ('teams.paused', -OLD.is_paused)
+    ON CONFLICT(key) DO UPDATE SET n = n + excluded.n;
+END;
+{links_triggers}
+COMMIT;
+"""
+
+_LINK_STATS_BACKFILL = """
+INSERT OR IGNORE INTO stats (key, n) SELECT '{kind}', COUNT(*) FROM {kind}, stats_backfill;
+INSERT OR IGNORE INTO stats (key, n) SELECT '{kind}.' || status, COUNT(*) FROM {kind}, stats_backfill GROUP BY 1;
+INSERT OR IGNORE INTO stats (key, n)
+    SELECT '{kind}.hour.' || substr(COALESCE(json_extract(data, '$.created_at'), ''), 1, 13), COUNT(*)
+    FROM {kind}, stats_backfill GROUP BY 1;
+"""
+
+_LINK_STATS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS stats_{kind}_insert AFTER INSERT ON {kind} BEGIN
+    INSERT INTO stats (key, n) VALUES
+        ('{kind}', 1),
+        ('{kind}.' || NEW.status, 1),
+        ('{kind}.hour.' || substr(COALESCE(json_extract(NEW.data, '$.created_at'), ''), 1, 13), 1)
+    ON CONFLICT(key) DO UPDATE SET n = n + excluded.n;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_{kind}_update AFTER UPDATE OF status ON {kind} BEGIN
+    INSERT INTO stats (key, n) VALUES ('{kind}.' || OLD.status, -1), ('{kind}.' || NEW.status, 1)
+    ON CONFLICT(key) DO UPDATE SET n = n + excluded.n;
+END;
+"""
+
+_STATS_SCHEMA = _STATS_SCHEMA.format(
+    links_backfill="".join(_LINK_STATS_BACKFILL.format(kind=kind) for kind in ("requests", "invites")),
+    links_triggers="".join(_LINK_STATS_TRIGGERS.format(kind=kind) for kind in ("requests", "invites")),
+)
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _conn() -> sqlite3.Connection:
+    """Returns this thread's connection, creating the database on first use."""
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        SQLITE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(SQLITE_FILE, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript(_SCHEMA)
+                conn.executescript(_STATS_SCHEMA)
+                _schema_ready = True
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def _tx() -> Iterator[sqlite3.Connection]:
+    """Write transaction; IMMEDIATE so read-then-write can't deadlock on upgrade."""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+@contextmanager
+def _read_tx() -> Iterator[sqlite3.Connection]:
+    """Read transaction: every query inside sees the same database snapshot."""
+    conn = _conn()
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+
+# Versions live in the database so that snapshots cached by one process
+# notice changes committed by another.
+_snapshots = Snapshots()
+
+
+def _bump(conn: sqlite3.Connection, name: str) -> None:
+    conn.execute(
+        "INSERT INTO versions (name, version) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+        (name,),
+    )
+
+
+def _version(conn: sqlite3.Connection, name: str) -> int:
+    row = conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def _load(row: tuple | None) -> dict | None:
+    return json.loads(row[0]) if row else None
+
+
+def _dump(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False)
+
+
+def _next_value(conn: sqlite3.Connection, name: str) -> int:
+    """Next value of a sequence, allocated inside the caller's write transaction."""
+    return conn.execute(
+        "INSERT INTO sequences (name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + 1 RETURNING value",
+        (name,),
+    ).fetchone()[0]
+
+
+def _advance(conn: sqlite3.Connection, name: str, value: int) -> None:
+    """Makes sure the sequence never hands out `value` or anything below it."""
+    conn.execute(
+        "INSERT INTO sequences (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)",
+        (name, value),
+    )
+
+
+# --- Users ---
+def _upsert_user(conn: sqlite3.Connection, user: dict) -> None:
+    _bump(conn, "users")
+    conn.execute(
+        "INSERT INTO users (user_id, specialty, is_active, data) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET specialty = excluded.specialty, "
+        "is_active = excluded.is_active, data = excluded.data",
+        (user["user_id"], user.get("specialty", "other"), int(user.get("is_active", True)), _dump(user)),
+    )
+
+
+def get_users() -> dict[str, dict]:
+    rows = _conn().execute("SELECT user_id, data FROM users ORDER BY rowid")
+    return {str(uid): json.loads(data) for uid, data in rows}
+
+
+def get_user(user_id: int) -> dict | None:
+    return _load(_conn().execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone())
+
+
+def save_user(
+    user_id: int,
+    username: str | None,
+    display_name: str,
+    age_category: str,
+    participation_format: str,
+    specialty: str,
+    description: str,
+    is_active: bool = True,
+) -> None:
+    with _tx() as conn:
+        existing = _load(conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()) or {}
+        _upsert_user(conn, {
+            "user_id": user_id,
+            "username": username or "",
+            "display_name": display_name or (username or ""),
+            "age_category": age_category,
+            "participation_format": participation_format,
+            "specialty": specialty,
+            "description": description,
+            "is_active": existing.get("is_active", True) if existing else True,
+            "created_at": existing.get("created_at", datetime.utcnow().isoformat()),
+            "version": _next_value(conn, "profile_version"),
+        })
+
+
+def set_user_active(user_id: int, is_active: bool) -> bool:
+    with _tx() as conn:
+        cur = conn.execute(
+            "UPDATE users SET is_active = ?, data = json_set(data, '$.is_active', json(?)) WHERE user_id = ?",
+            (int(is_active), "true" if is_active else "false", user_id),
+        )
+        _bump(conn, "users")
+    return cur.rowcount > 0
+
+
+def get_active_users() -> list[tuple[str, dict]]:
+    return find_active_users()
+
+
+def get_active_users_by_specialty(specialty: str | None) -> list[tuple[str, dict]]:
+    """Active users in browse order. The list is a shared snapshot; don't mutate it."""
+    if not specialty or specialty == "all":
+        return find_active_users()
+    return find_active_users([specialty])
+
+
+def find_active_users(
+    specialties: list[str] | None = None,
+    participation_format: str | None = None,
+    age_category: str | None = None,
+) -> list[tuple[str, dict]]:
+    """Active users matching all given filters (None = any), in browse order.
+
+    Uses the (is_active, specialty) index and caches the result until users
+    change; the list is shared, don't mutate it.
+    """
+    sql = "SELECT user_id, data FROM users WHERE is_active = 1"
+    params: list = []
+    if specialties is not None:
+        sql += f" AND specialty IN ({', '.join('?' * len(specialties))})"
+        params += specialties
+    if participation_format is not None:
+        sql += " AND COALESCE(json_extract(data, '$.participation_format'), 'online') = ?"
+        params.append(participation_format)
+    if age_category is not None:
+        sql += " AND COALESCE(json_extract(data, '$.age_category'), '18+') = ?"
+        params.append(age_category)
+    sql += " ORDER BY rowid"
+
+    def build() -> list[tuple[str, dict]]:
+        return [(str(uid), json.loads(data)) for uid, data in conn.execute(sql, params)]
+
+    spec_key = tuple(sorted(specialties)) if specialties is not None else None
+    with _read_tx() as conn:
+        return _snapshots.get(
+            ("users", spec_key, participation_format, age_category),
+            _version(conn, "users"),
+            build,
+        )
+
+
+# --- Teams ---
+def _upsert_team(conn: sqlite3.Connection, team: dict) -> None:
+    _bump(conn, "teams")
+    conn.execute(
+        "INSERT INTO teams (owner_id, team_number, is_paused, data) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(owner_id) DO UPDATE SET team_number = excluded.team_number, "
+        "is_paused = excluded.is_paused, data = excluded.data",
+        (team["owner_id"], team.get("team_number"), int(team.get("is_paused", False)), _dump(team)),
+    )
+
+
+def get_teams() -> dict[str, dict]:
+    rows = _conn().execute("SELECT owner_id, data FROM teams ORDER BY rowid")
+    return {f"owner_{oid}": json.loads(data) for oid, data in rows}
+
+
+def get_team(owner_id: int) -> dict | None:
+    return _load(_conn().execute("SELECT data FROM teams WHERE owner_id = ?", (owner_id,)).fetchone())
+
+
+def get_active_teams() -> list[tuple[str, dict]]:
+    """Returns list of (team_key, team) for teams where is_paused is False.
+
+    The list is a shared snapshot, rebuilt only after teams change; don't mutate it.
+    """
+
+    def build() -> list[tuple[str, dict]]:
+        rows = conn.execute("SELECT owner_id, data FROM teams WHERE is_paused = 0 ORDER BY rowid")
+        return [(f"owner_{oid}", json.loads(data)) for oid, data in rows]
+
+    with _read_tx() as conn:
+        return _snapshots.get(("teams", None), _version(conn, "teams"), build)
+
+
+def save_team(
+    owner_id: int,
+    owner_username: str | None,
+    team_name: str,
+    description: str,
+    roles_needed: list[str],
+    pitch_format: str = "online",
+) -> None:
+    with _tx() as conn:
+        existing = _load(conn.execute("SELECT data FROM teams WHERE owner_id = ?", (owner_id,)).fetchone()) or {}
+        team_number = existing.get("team_number")
+        if team_number is None:
+            team_number = _next_value(conn, "team_number")
+        _upsert_team(conn, {
+            "owner_id": owner_id,
+            "owner_username": owner_username or "",
+            "team_number": team_number,
+            "team_name": team_name or "",
+            "description": description,
+            "roles_needed": roles_needed,
+            "pitch_format": pitch_format,
+            "is_paused": existing.get("is_paused", False),
+            "members": existing.get("members", []),
+            "created_at": existing.get("created_at", datetime.utcnow().isoformat()),
+            "version": _next_value(conn, "profile_version"),
+        })
+
+
+def delete_team(owner_id: int) -> bool:
+    with _tx() as conn:
+        cur = conn.execute("DELETE FROM teams WHERE owner_id = ?", (owner_id,))
+        _bump(conn, "teams")
+    return cur.rowcount > 0
+
+
+def toggle_team_pause(owner_id: int) -> bool:
+    """Toggles is_paused for the team. Returns new is_paused value."""
+    with _tx() as conn:
+        team = _load(conn.execute("SELECT data FROM teams WHERE owner_id = ?", (owner_id,)).fetchone())
+        if team is None:
+            return False
+        team["is_paused"] = not team.get("is_paused", False)
+        team["version"] = _next_value(conn, "profile_version")
+        _upsert_team(conn, team)
+    return team["is_paused"]
+
+
+# --- Requests ---
+def _insert_request(conn: sqlite3.Connection, req: dict) -> None:
+    conn.execute(
+        "INSERT INTO requests (request_id, solo_id, team_owner_id, status, data) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(request_id) DO UPDATE SET status = excluded.status, data = excluded.data",
+        (req["request_id"], req["solo_id"], req["team_owner_id"], req["status"], _dump(req)),
+    )
+
+
+def get_requests() -> dict[str, dict]:
+    rows = _conn().execute("SELECT request_id, data FROM requests ORDER BY rowid")
+    return {rid: json.loads(data) for rid, data in rows}
+
+
+def create_request(solo_id: int, team_owner_id: int) -> str | None:
+    """Creates a pending request. Returns request_id or None if duplicate."""
+    with _tx() as conn:
+        dup = conn.execute(
+            "SELECT 1 FROM requests WHERE solo_id = ? AND team_owner_id = ? AND status = 'pending'",
+            (solo_id, team_owner_id),
+        ).fetchone()
+        if dup:
+            return None
+        request_id = f"req_{_next_value(conn, 'request')}"
+        _insert_request(conn, {
+            "request_id": request_id,
+            "solo_id": solo_id,
+            "team_owner_id": team_owner_id,
+            "status": "pending",
+            "created_at": datetime.utcnow().isoformat(),
+        })
+    return request_id
+
+
+def get_request(request_id: str) -> dict | None:
+    return _load(_conn().execute("SELECT data FROM requests WHERE request_id = ?", (request_id,)).fetchone())
+
+
+def get_request_by_solo_and_team(solo_id: int, team_owner_id: int) -> dict | None:
+    row = _conn().execute(
+        "SELECT data FROM requests WHERE solo_id = ? AND team_owner_id = ? ORDER BY rowid LIMIT 1",
+        (solo_id, team_owner_id),
+    ).fetchone()
+    return _load(row)
+
+
+def get_pending_requests(team_owner_id: int) -> list[dict]:
+    rows = _conn().execute(
+        "SELECT data FROM requests WHERE team_owner_id = ? AND status = 'pending' ORDER BY rowid",
+        (team_owner_id,),
+    )
+    return [json.loads(data) for (data,) in rows]
+
+
+def update_request_status(request_id: str, status: str, expected: str | None = None) -> bool:
+    """See json_storage.update_request_status; `expected` is checked in the UPDATE itself."""
+    sql = "UPDATE requests SET status = ?, data = json_set(data, '$.status', ?) WHERE request_id = ?"
+    params: tuple = (status, status, request_id)
+    if expected is not None:
+        sql += " AND status = ?"
+        params += (expected,)
+    with _tx() as conn:
+        cur = conn.execute(sql, params)
+    return cur.rowcount > 0
+
+
+# --- Invites (team -> solo) ---
+def _insert_invite(conn: sqlite3.Connection, inv: dict) -> None:
+    conn.execute(
+        "INSERT INTO invites (invite_id, team_owner_id, solo_id, status, data) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(invite_id) DO UPDATE SET status = excluded.status, data = excluded.data",
+        (inv["invite_id"], inv["team_owner_id"], inv["solo_id"], inv.get("status", "pending"), _dump(inv)),
+    )
+
+
+def get_invites() -> dict[str, dict]:
+    rows = _conn().execute("SELECT invite_id, data FROM invites ORDER BY rowid")
+    return {iid: json.loads(data) for iid, data in rows}
+
+
+def create_invite(team_owner_id: int, solo_id: int) -> str | None:
+    with _tx() as conn:
+        dup = conn.execute(
+            "SELECT 1 FROM invites WHERE team_owner_id = ? AND solo_id = ? AND status = 'pending'",
+            (team_owner_id, solo_id),
+        ).fetchone()
+        if dup:
+            return None
+        invite_id = f"inv_{_next_value(conn, 'invite')}"
+        _insert_invite(conn, {
+            "invite_id": invite_id,
+            "team_owner_id": team_owner_id,
+            "solo_id": solo_id,
+            "status": "pending",
+            "created_at": datetime.utcnow().isoformat(),
+        })
+    return invite_id
+
+
+def get_invite(invite_id: str) -> dict | None:
+    return _load(_conn().execute("SELECT data FROM invites WHERE invite_id = ?", (invite_id,)).fetchone())
+
+
+def get_pending_invites_for_solo(solo_id: int) -> list[dict]:
+    rows = _conn().execute(
+        "SELECT data FROM invites WHERE solo_id = ? AND status = 'pending' ORDER BY rowid",
+        (solo_id,),
+    )
+    return [json.loads(data) for (data,) in rows]
+
+
+def update_invite_status(invite_id: str, status: str, expected: str | None = None) -> bool:
+    sql = "UPDATE invites SET status = ?, data = json_set(data, '$.status', ?) WHERE invite_id = ?"
+    params: tuple = (status, status, invite_id)
+    if expected is not None:
+        sql += " AND status = ?"
+        params += (expected,)
+    with _tx() as conn:
+        cur = conn.execute(sql, params)
+    return cur.rowcount > 0
+
+
+# --- Stats ---
+def get_stats() -> dict:
+    """Aggregate counters for /stats, maintained by triggers (see _STATS_SCHEMA)."""
+    hour_keys = [f"{kind}.hour.{hour}" for kind in ("requests", "invites") for hour in hours_back(24)]
+    with _read_tx() as conn:
+        rows = conn.execute("SELECT key, n FROM stats WHERE instr(key, '.hour.') = 0").fetchall()
+        rows += conn.execute(
+            f"SELECT key, n FROM stats WHERE key IN ({', '.join('?' * len(hour_keys))})", hour_keys
+        ).fetchall()
+    return build_stats(dict(rows))
+
+
+# --- Persistence ---
+def start_writer() -> None:
+    """SQLite commits each mutation itself, so there is no background writer."""
+
+
+async def flush_writes() -> None:
+    """SQLite commits each mutation itself, so there is nothing to flush."""
@@ -0,0 +1,97 @@
+"""Live aggregate counters behind /stats.
+
+Both backends keep a flat map of counter name -> value, updated on every
+mutation (json_storage in memory via Tally, sqlite_storage via triggers),
+using the same names:
+
+    users, users.active, users.specialty.<s>, users.active.specialty.<s>
+    teams, teams.paused
+    requests, requests.<status>, requests.hour.<YYYY-MM-DDTHH>   (same for invites)
+
+build_stats() turns that map into the report, so /stats never scans records.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Mapping
+
+
+def user_keys(user: dict) -> Iterable[str]:
+    specialty = user.get("specialty") or "other"
+    yield "users"
+    yield f"users.specialty.{specialty}"
+    if user.get("is_active", True):
+        yield "users.active"
+        yield f"users.active.specialty.{specialty}"
+
+
+def team_keys(team: dict) -> Iterable[str]:
+    yield "teams"
+    if team.get("is_paused", False):
+        yield "teams.paused"
+
+
+def link_keys(kind: str) -> Callable[[dict], Iterable[str]]:
+    """Counter names for a request or invite record; kind is "requests" or "invites"."""
+
+    def keys(record: dict) -> Iterable[str]:
+        yield kind
+        yield f"{kind}.{record.get('status', 'pending')}"
+        yield f"{kind}.hour.{record.get('created_at', '')[:13]}"
+
+    return keys
+
+
+class Tally:
+    """Counters that follow a set of records as they are added, changed and removed."""
+
+    def __init__(self, keys_of: Callable[[dict], Iterable[str]]) -> None:
+        self.keys_of = keys_of
+        self.counts: Counter = Counter()
+        self._contributions: dict[str, tuple[str, ...]] = {}
+
+    def put(self, record_id: str, record: dict) -> None:
+        self.remove(record_id)
+        keys = tuple(self.keys_of(record))
+        self.counts.update(keys)
+        self._contributions[record_id] = keys
+
+    def remove(self, record_id: str) -> None:
+        keys = self._contributions.pop(record_id, None)
+        if keys:
+            self.counts.subtract(keys)
+
+
+def hours_back(n: int, now: datetime | None = None) -> list[str]:
+    """Hour keys (UTC, created_at[:13] format) for the last n hours, current one first."""
+    now = now or datetime.utcnow()
+    return [(now - timedelta(hours=i)).strftime("%Y-%m-%dT%H") for i in range(n)]
+
+
+def build_stats(counts: Mapping[str, int], now: datetime | None = None) -> dict:
+    hours = hours_back(24, now)
+    stats: dict = {
+        "users": {"total": counts.get("users", 0), "active": counts.get("users.active", 0), "by_specialty": {}},
+        "teams": {"total": counts.get("teams", 0), "paused": counts.get("teams.paused", 0)},
+    }
+    stats["teams"]["active"] = stats["teams"]["total"] - stats["teams"]["paused"]
+    prefix = "users.specialty."
+    for key, n in counts.items():
+        if key.startswith(prefix) and n:
+            specialty = key[len(prefix):]
+            stats["users"]["by_specialty"][specialty] = {
+                "total": n,
+                "active": counts.get(f"users.active.specialty.{specialty}", 0),
+            }
+    for kind in ("requests", "invites"):
+        accepted = counts.get(f"{kind}.accepted", 0)
+        denied = counts.get(f"{kind}.denied", 0)
+        stats[kind] = {
+            "total": counts.get(kind, 0),
+            "pending": counts.get(f"{kind}.pending", 0),
+            "accepted": accepted,
+            "denied": denied,
+            "this_hour": counts.get(f"{kind}.hour.{hours[0]}", 0),
+            "last_24h": sum(counts.get(f"{kind}.hour.{h}", 0) for h in hours),
+            "acceptance_rate": accepted / (accepted + denied) if accepted + denied else None,
+        }
+    return stats
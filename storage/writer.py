@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import Executor, Future
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from typing import Callable
+
+from metrics import storage_write_bytes, storage_write_seconds
+
+logger = logging.getLogger(__name__)
+
+
+def dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def write_atomic(path: Path, payload: str) -> None:
+    """Writes payload to a temp file next to path and renames it over path."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = payload.encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".json")
+    try:
+        with storage_write_seconds.time(file=path.name):
+            with open(fd, "wb") as f:
+                f.write(data)
+            Path(tmp).replace(path)
+    except Exception:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    storage_write_bytes.observe(len(data), file=path.name)
+
+
+class PersistenceWriter:
+    """Debounced, coalescing file writer.
+
+    Until start() is called every write happens synchronously, which is what
+    scripts want. Once started on the bot's event loop, write() only marks
+    the file dirty; all files dirtied within `delay` seconds are serialized
+    and written in one job on the storage executor. The latest data wins, so
+    N mutations of the same file cost a single write. write() and run() may
+    be called from any thread.
+    """
+
+    def __init__(
+        self,
+        delay: float,
+        executor: Executor,
+        on_written: Callable[[Path], None] | None = None,
+        lock_for: Callable[[Path], AbstractContextManager] | None = None,
+    ) -> None:
+        self.delay = delay
+        self._executor = executor
+        self._on_written = on_written
+        self._lock_for = lock_for or (lambda path: nullcontext())
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+        self._dirty: dict[Path, dict] = {}
+        self._inflight: set[Path] = set()
+        self._futures: set[Future] = set()
+        self._armed = False
+        self._handle: asyncio.TimerHandle | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self.delay > 0
+
+    def start(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        self._loop = loop or asyncio.get_running_loop()
+
+    def pending(self, path: Path) -> bool:
+        """True while path has writes that are not on disk yet."""
+        return path in self._dirty or path in self._inflight
+
+    def write(self, path: Path, data: dict) -> None:
+        if not self.running:
+            with self._lock_for(path):
+                payload = dumps(data)
+            write_atomic(path, payload)
+            if self._on_written:
+                self._on_written(path)
+            return
+        with self._lock:
+            self._dirty[path] = data
+        self._arm()
+
+    def run(self, fn: Callable[..., None], *args) -> None:
+        """Runs fn(*args) on the storage executor, or inline if the writer isn't started.
+
+        Jobs are awaited by flush() just like scheduled writes.
+        """
+        if not self.running:
+            fn(*args)
+            return
+        self._track(self._executor.submit(fn, *args))
+
+    def _arm(self) -> None:
+        with self._lock:
+            if self._armed:
+                return
+            self._armed = True
+        self._loop.call_soon_threadsafe(self._set_timer)
+
+    def _set_timer(self) -> None:
+        self._handle = self._loop.call_later(self.delay, self._kick)
+
+    def _kick(self) -> None:
+        self._handle = None
+        with self._lock:
+            self._armed = False
+        self._track(self._executor.submit(self._write_dirty))
+
+    def _track(self, fut: Future) -> None:
+        with self._lock:
+            self._futures.add(fut)
+        fut.add_done_callback(self._job_done)
+
+    def _job_done(self, fut: Future) -> None:
+        with self._lock:
+            self._futures.discard(fut)
+        if fut.exception() is not None:
+            logger.error("Background storage job failed: %r", fut.exception())
+
+    def _write_dirty(self) -> None:
+        with self._lock:
+            # Keep at most one write per file in flight so they land in order;
+            # anything skipped here stays dirty for the next round.
+            batch = {p: d for p, d in self._dirty.items() if p not in self._inflight}
+            for path in batch:
+                del self._dirty[path]
+            self._inflight.update(batch)
+        failed: dict[Path, dict] = {}
+        for path, data in batch.items():
+            try:
+                # The owner's lock keeps other threads from mutating data mid-dump.
+                with self._lock_for(path):
+                    payload = dumps(data)
+                write_atomic(path, payload)
+            except Exception as e:
+                logger.error("Failed to write %s, will retry: %r", path, e)
+                failed[path] = data
+            else:
+                if self._on_written:
+                    self._on_written(path)
+        with self._lock:
+            self._inflight.difference_update(batch)
+            for path, data in failed.items():
+                self._dirty.setdefault(path, data)
+            again = bool(self._dirty)
+        if again:
+            self._arm()
+
+    async def flush(self, attempts: int = 3) -> None:
+        """Writes everything that is still pending. Call before shutdown."""
+        if self._loop is None:
+            return
+        for _ in range(attempts):
+            if self._handle is not None:
+                self._handle.cancel()
+            self._kick()
+            while True:
+                with self._lock:
+                    futures = list(self._futures)
+                if not futures:
+                    break
+                await asyncio.gather(*(asyncio.wrap_future(f) for f in futures), return_exceptions=True)
+            if not self._dirty:
+                return
+        logger.error("Gave up flushing %d file(s): %s", len(self._dirty), ", ".join(map(str, self._dirty)))
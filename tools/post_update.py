@@ -0,0 +1,64 @@
+"""Posts a fake Telegram update to a locally running webhook.
+
+    BOT_MODE=webhook WEB_PORT=8080 python main.py
+    python -m tools.post_update --port 8080 --text /start
+    python -m tools.post_update --port 8080 --callback solo:browse:0
+
+Outgoing Bot API calls made by the handlers will fail unless BOT_TOKEN is
+real; the point is to exercise delivery, the secret check and routing.
+"""
+import argparse
+import json
+import random
+import time
+import urllib.request
+
+from config import WEBHOOK_PATH, WEBHOOK_SECRET
+
+
+def make_update(user_id: int, text: str | None = None, callback: str | None = None) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Test", "username": f"user{user_id}"}
+    message = {
+        "message_id": random.randint(1, 10**6),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": user,
+        "text": text or "",
+    }
+    update: dict = {"update_id": random.randint(1, 10**9)}
+    if callback is not None:
+        update["callback_query"] = {
+            "id": str(random.randint(1, 10**9)),
+            "from": user,
+            "chat_instance": str(user_id),
+            "message": {**message, "from": {"id": 1, "is_bot": True, "first_name": "Bot"}},
+            "data": callback,
+        }
+    else:
+        update["message"] = message
+    return update
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--user-id", type=int, default=100500)
+    parser.add_argument("--secret", default=WEBHOOK_SECRET)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--text", default="/start")
+    group.add_argument("--callback")
+    args = parser.parse_args()
+
+    body = json.dumps(make_update(args.user_id, args.text, args.callback)).encode()
+    request = urllib.request.Request(
+        f"http://{args.host}:{args.port}{WEBHOOK_PATH}",
+        data=body,
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": args.secret},
+    )
+    with urllib.request.urlopen(request) as response:
+        print(response.status, response.read().decode() or "<empty>")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import WEB_HOST, WEB_PORT, WEBHOOK_BASE_URL, WEBHOOK_CONCURRENCY, WEBHOOK_PATH, WEBHOOK_SECRET
+from middlewares import ConcurrencyLimitMiddleware, PerUserOrderMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+def build_app(bot: Bot, dp: Dispatcher, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET) -> web.Application:
+    """aiohttp app that feeds Telegram webhook calls into the dispatcher.
+
+    Requests without the right X-Telegram-Bot-Api-Secret-Token header are
+    rejected with 401 when `secret` is set. Updates are handled in background
+    tasks, concurrently across users and in arrival order per user.
+    """
+    dp.update.outer_middleware(PerUserOrderMiddleware())
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(WEBHOOK_CONCURRENCY))
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret or None).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+@asynccontextmanager
+async def serving(app: web.Application, host: str, port: int) -> AsyncIterator[None]:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    try:
+        yield
+    finally:
+        await runner.cleanup()
+
+
+async def set_webhook(bot: Bot, allowed_updates: list[str]) -> None:
+    """Points Telegram at WEBHOOK_BASE_URL; without it the webhook is managed elsewhere."""
+    if WEBHOOK_BASE_URL:
+        await bot.set_webhook(
+            f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=min(WEBHOOK_CONCURRENCY, 100),
+            allowed_updates=allowed_updates,
+        )
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    async with serving(build_app(bot, dp), WEB_HOST, WEB_PORT):
+        logger.info("Listening for webhook calls on %s:%s%s", WEB_HOST, WEB_PORT, WEBHOOK_PATH)
+        await set_webhook(bot, dp.resolve_used_update_types())
+        await asyncio.Event().wait()